@@ -1,27 +1,79 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
 import requests
 import os
-from data_load import load_data
-from data_process import process_data
+from data_load import load_season, load_lineups, CURRENT_SEASON
+from partitions import SeasonPartitions
+from incremental import IncrementalFeatureEngine
+from feature_store import load_snapshot, write_snapshot, snapshot_lock, read_manifest
+from game_index import GameIndex
+from inference import RemoteModel, LocalModel
 from configs import features
-from datetime import datetime
 import pytz
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from utils import getEndpointDate
+from prediction_cache import PredictionCache
+from response_cache import response_cache
+from scoreboard import ScoreboardPoller, Schedule
+import metrics
 
 app = Flask(__name__, static_folder="../frontend/dist", static_url_path="/")
 CORS(app)
 
 # Dockerized XGB prediction service URL
 XGB_SERVICE_URL = "https://xgb-predictor-latest.onrender.com/predict"
+XGB_BATCH_URL = "https://xgb-predictor-latest.onrender.com/predict-batch"
+
+# "remote" calls the service above, "local" predicts in-process with the booster at XGB_MODEL_PATH
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "remote")
+XGB_MODEL_PATH = os.environ.get("XGB_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "xgb_model.json"))
+
+# Incremental feature state, so a restart only folds in games played since the last boot. Off by
+# default: update() still loads and re-sorts the whole season, and is slower than process_data()
+INCREMENTAL_FEATURES = os.environ.get("INCREMENTAL_FEATURES", "0") == "1"
+FEATURE_STATE_PATH = os.environ.get("FEATURE_STATE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "feature_state.pkl"))
+
+# Versioned feature_df snapshot written by the daily job (or the first worker that had to rebuild)
+FEATURE_STORE_DIR = os.environ.get("FEATURE_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "feature_store"))
+# how often (seconds) a running worker checks the store for a newer snapshot
+FEATURE_REFRESH_INTERVAL = int(os.environ.get("FEATURE_REFRESH_INTERVAL", 60))
+
+# live play-by-play feeds are fetched in parallel, each bounded by its own timeout
+PLAY_BY_PLAY_WORKERS = int(os.environ.get("PLAY_BY_PLAY_WORKERS", 8))
+PLAY_BY_PLAY_TIMEOUT = float(os.environ.get("PLAY_BY_PLAY_TIMEOUT", 5))
+
+# today's scoreboard is refreshed by one background poller per worker and served from memory
+SCOREBOARD_POLL_INTERVAL = float(os.environ.get("SCOREBOARD_POLL_INTERVAL", 10))
+SCOREBOARD_IDLE_INTERVAL = float(os.environ.get("SCOREBOARD_IDLE_INTERVAL", 60))
+# SCOREBOARD_POLLER=0 never starts the poller thread (offline benchmarks); /api/nba-scores then fetches directly
+SCOREBOARD_POLLER = os.environ.get("SCOREBOARD_POLLER", "1") == "1"
+# the season schedule is re-downloaded at most this often (seconds)
+SCHEDULE_REFRESH_INTERVAL = int(os.environ.get("SCHEDULE_REFRESH_INTERVAL", 3600))
+# seconds between keep-alive comments on an idle /api/nba-scores/stream connection
+SCORE_STREAM_KEEPALIVE = float(os.environ.get("SCORE_STREAM_KEEPALIVE", 15))
+# a stream connection is closed after this many seconds and the browser reconnects, so an open tab
+# never holds a worker thread for good
+SCORE_STREAM_MAX_AGE = float(os.environ.get("SCORE_STREAM_MAX_AGE", 300))
+# open streams per worker; past it clients get a 503 and poll /api/nba-scores instead, so streams
+# never take every thread of gunicorn.conf.py's gthread workers
+SCORE_STREAM_LIMIT = int(os.environ.get("SCORE_STREAM_LIMIT", 16))
+
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 512))
+PREDICTION_CACHE_TTL = int(os.environ.get("PREDICTION_CACHE_TTL", 3600))
 
 session = requests.Session()
 session.headers.update({
     "User-Agent": "Mozilla/5.0...",
     "Accept": "application/json, text/plain, */*",
 })
+# keep one pooled connection per play-by-play worker
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=PLAY_BY_PLAY_WORKERS))
+metrics.instrument_session(session)
+play_by_play_executor = ThreadPoolExecutor(max_workers=PLAY_BY_PLAY_WORKERS, thread_name_prefix="playbyplay")
 
 @app.route("/", defaults={"path": ""})
 @app.route("/<path:path>")
@@ -31,21 +83,83 @@ def serve(path):
     return send_from_directory(app.static_folder, "index.html")
 
 
+def build_features():
+    scraped_df = load_lineups()
+    if not INCREMENTAL_FEATURES:
+        return SeasonPartitions(load_season, CURRENT_SEASON).load([CURRENT_SEASON], scraped_df, required_columns)
+    engine = IncrementalFeatureEngine.load(FEATURE_STATE_PATH)
+    partitions = SeasonPartitions(load_season, CURRENT_SEASON, builder=engine.update)
+    feature_df = partitions.load([CURRENT_SEASON], scraped_df, required_columns)
+    try:
+        engine.save(FEATURE_STATE_PATH)
+    except Exception as e:
+        print(f"Error saving feature state: {e}")
+    return feature_df
+
+
+def load_features(date):
+    feature_df, version = load_snapshot(FEATURE_STORE_DIR, date, required_columns)
+    if feature_df is None:
+        with snapshot_lock(FEATURE_STORE_DIR):
+            # another worker may have finished the rebuild while this one waited
+            feature_df, version = load_snapshot(FEATURE_STORE_DIR, date, required_columns)
+            if feature_df is None:
+                print("No current feature snapshot, rebuilding...")
+                feature_df = build_features()
+                try:
+                    version = write_snapshot(feature_df, FEATURE_STORE_DIR, date)
+                except Exception as e:
+                    print(f"Error writing feature snapshot: {e}")
+                    version = f"local-{int(time.time())}"
+    return feature_df, version
+
+
+def refresh_features():
+    # swaps in a newer snapshot (e.g. from the daily job); cached predictions are keyed by
+    # the old version, so they stop matching and are dropped
+    global feature_df, game_index, last_refresh_check
+    if time.monotonic() - last_refresh_check < FEATURE_REFRESH_INTERVAL:
+        return
+    with refresh_lock:
+        if time.monotonic() - last_refresh_check < FEATURE_REFRESH_INTERVAL:
+            return
+        last_refresh_check = time.monotonic()
+        manifest = read_manifest(FEATURE_STORE_DIR)
+        if manifest is None or manifest['version'] == game_index.version:
+            return
+        new_df, version = load_snapshot(FEATURE_STORE_DIR, required=required_columns)
+        if new_df is None:
+            return
+        print(f"Reloading features from snapshot {version}")
+        feature_df, game_index = new_df, GameIndex(new_df, features, version)
+        prediction_cache.clear()
+
+
 print("Loading data...")
-raw_df, player_df, scraped_df= load_data()
-feature_df = process_data(raw_df, player_df, scraped_df)
 date = getEndpointDate()
+required_columns = features + ['next_GAME_ID', 'next_home']
+feature_df, feature_version = load_features(date)
+game_index = GameIndex(feature_df, features, feature_version)
+prediction_cache = PredictionCache(maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+refresh_lock = threading.Lock()
+last_refresh_check = time.monotonic()
+stream_slots = threading.BoundedSemaphore(SCORE_STREAM_LIMIT)
 
-url = f'https://cdn.nba.com/static/json/staticData/scheduleLeagueV2_1.json?t={int(time.time())}'
-headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/117.0",
-    "Accept": "application/json, text/plain, */*",
-    "Referer": "https://www.nba.com/",
-    "Origin": "https://www.nba.com",
-}
-response = session.get(url, headers=headers)
-scheduleLeagueV2data = response.json()
+if INFERENCE_BACKEND == "local":
+    model = LocalModel(XGB_MODEL_PATH, features)
+else:
+    model = RemoteModel(XGB_SERVICE_URL, XGB_BATCH_URL, features, session=metrics.instrument_session(requests.Session()))
+
+schedule = Schedule(session, interval=SCHEDULE_REFRESH_INTERVAL)
+schedule.load()
+
+scoreboard_poller = ScoreboardPoller(session, play_by_play_executor, interval=SCOREBOARD_POLL_INTERVAL,
+                                     idle_interval=SCOREBOARD_IDLE_INTERVAL, timeout=PLAY_BY_PLAY_TIMEOUT)
+if SCOREBOARD_POLLER:
+    scoreboard_poller.start()
 print("Data loaded and processed!")
+if metrics.METRICS:
+    print(metrics.stage_report())
 
 @app.route("/run-calculations", methods=["POST"])
 def get_predictions():
@@ -55,20 +169,12 @@ def get_predictions():
 
         if not gameid:
             return jsonify({"error": "Missing 'home' in request body"}), 400
-        game_rows = feature_df[((feature_df['next_GAME_ID'] == gameid) & (feature_df['next_home'] == 1))]
-        if game_rows.empty:
+        refresh_features()
+        index = game_index
+        if gameid not in index:
             return jsonify({"error": f"No data found for team {gameid}"}), 404
 
-        row_dict = game_rows[features].iloc[0].to_dict()
-
-        try:
-            response = requests.post(XGB_SERVICE_URL, json={"row": row_dict})
-            response.raise_for_status()
-            proba = response.json()
-            home_win_prob = proba.get("home_win_prob")
-        except Exception as e:
-            print(f"XGB service error: {e}")
-            home_win_prob = None
+        home_win_prob = predict_home_win_probs(index, [gameid])[gameid]
         return jsonify({"home_win_prob": home_win_prob})
 
     except Exception as e:
@@ -76,12 +182,86 @@ def get_predictions():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/run-calculations/batch", methods=["POST"])
+def get_batch_predictions():
+    try:
+        data = request.get_json(silent=True) or {}
+        selected_date = request.args.get("date") or data.get("date")
+        if selected_date:
+            gameids = [game['gameId'] for game in schedule.games(selected_date)]
+        else:
+            gameids = data.get("gameIds")
+
+        if not gameids:
+            return jsonify({"error": "Missing 'gameIds' or 'date' in request"}), 400
+
+        refresh_features()
+        index = game_index
+        known = [gameid for gameid in dict.fromkeys(gameids) if gameid in index]
+        probs = predict_home_win_probs(index, known) if known else {}
+        return jsonify({gameid: probs.get(gameid) for gameid in gameids})
+
+    except Exception as e:
+        print(f"Error in get_batch_predictions: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+def predict_home_win_probs(index, gameids):
+    # only games missing from the cache for this feature version reach the model
+    def compute(keys):
+        try:
+            probs = model.predict(index.rows([gameid for gameid, _ in keys]))
+            return dict(zip(keys, probs))
+        except Exception as e:
+            print(f"XGB service error: {e}")
+            return {}
+
+    probs = prediction_cache.get_many([(gameid, index.version) for gameid in gameids], compute)
+    return {gameid: probs[(gameid, index.version)] for gameid in gameids}
+
+
+@app.route("/api/prediction-cache", methods=["GET"])
+def get_prediction_cache_stats():
+    return jsonify({**prediction_cache.stats(), 'featureVersion': game_index.version})
+
+
+@app.route("/api/response-cache", methods=["GET"])
+def get_response_cache_stats():
+    return jsonify(response_cache.stats())
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    # Prometheus scrape endpoint: pipeline stages, upstream requests and the two caches
+    cache_requests = metrics.Counter("cache_requests_total", "Cache lookups by result", ("cache", "result"))
+    cache_entries = metrics.Gauge("cache_entries", "Entries currently held", ("cache",))
+    prediction_stats = prediction_cache.stats()
+    response_stats = response_cache.stats()
+    for result in ('hits', 'misses', 'collapsed'):
+        cache_requests.inc(prediction_stats[result], cache="prediction", result=result)
+    for result in ('hits', 'misses', 'expired'):
+        cache_requests.inc(response_stats[result], cache="response", result=result)
+    cache_entries.set(prediction_stats['size'], cache="prediction")
+    cache_entries.set(response_stats['entries'], cache="response")
+    return Response(metrics.render([cache_requests, cache_entries]), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/scoreboard-poller", methods=["GET"])
+def get_scoreboard_poller_stats():
+    return jsonify(scoreboard_poller.stats())
+
+
 @app.route('/api/nba-scores', methods=['GET'])
 def get_nba_scores():
     cache_buster = int(time.time())
     selected_date = request.args.get("date")
     try:
-        if selected_date == date: 
+        snapshot = scoreboard_poller.snapshot()
+        if snapshot is not None and selected_date == snapshot['gameDate']:
+            games = snapshot['games']
+            last_plays = snapshot['lastPlays']
+        elif selected_date == date:
+            # the poller has not produced a scoreboard yet
             url = f'https://cdn.nba.com/static/json/liveData/scoreboard/todaysScoreboard_00.json?t={cache_buster}'
             headers = {
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/117.0",
@@ -92,62 +272,113 @@ def get_nba_scores():
             response = session.get(url, headers=headers)
             data = response.json()
             games = data['scoreboard']['games']
+            last_plays = fetch_last_plays([game['gameId'] for game in games if game['gameStatus'] == 2], cache_buster)
         else:
-            for day in scheduleLeagueV2data['leagueSchedule']['gameDates']: 
-                formatted = day['gameDate'].split()[0]
-                if datetime.strptime(formatted, "%m/%d/%Y").strftime("%Y-%m-%d") == selected_date:
-                    games = day['games']
-                
-        boxscores = []
-
-        for game in games:
-            game_id = game['gameId']
-            visitor_abbr = game['awayTeam']['teamTricode']
-            home_abbr = game['homeTeam']['teamTricode']
-            game_status = game['gameStatus']
-            last_play = ""
-            if game_status == 2:
-                try:
-                    url = f'https://cdn.nba.com/static/json/liveData/playbyplay/playbyplay_{game_id}.json?t={cache_buster}'
-                    headers = {
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/117.0",
-                        "Accept": "application/json, text/plain, */*",
-                        "Referer": "https://www.nba.com/",
-                        "Origin": "https://www.nba.com",
-                    }
-                    response = session.get(url, headers=headers)
-                    data = response.json()
-                    last_play = data['game']['actions'][-1]['description']
-                except Exception as e:
-                    print(f"error: Failed to get play by play data: {e}")
-
-            box = {
-                'id': game_id,
-                'visitorTeam': {
-                    'name': game['awayTeam']['teamName'],
-                    'abbreviation': visitor_abbr,
-                    'score': game['awayTeam']['score'],
-                    'color': '#AAAAAA',
-                    'winProb': None
-                },
-                'homeTeam': {
-                    'name': game['homeTeam']['teamName'],
-                    'abbreviation': home_abbr,
-                    'score': game['homeTeam']['score'],
-                    'color': '#BBBBBB',
-                    'winProb': None
-                },
-                'gameState': game_status,
-                'gameStatusText': game['gameStatusText'] if game_status != 3 else "",
-                'lastPlay' : last_play
-            }
-            boxscores.append(box)
+            games = schedule.games(selected_date)
+            last_plays = fetch_last_plays([game['gameId'] for game in games if game['gameStatus'] == 2], cache_buster)
+
+        boxscores = [make_boxscore(game, last_plays.get(game['gameId'], "")) for game in games]
         return jsonify(boxscores)
 
     except Exception as e:
         print(f"Error fetching NBA scores: {e}")
         return jsonify({"error": "Failed to fetch data from NBA API"}), 500
 
+
+@app.route("/api/nba-scores/stream", methods=["GET"])
+def stream_nba_scores():
+    # Server-Sent Events for today's games: every boxscore once, then only the games whose
+    # score, status text or last play changed, as {gameId: boxscore}. With ?date= only a
+    # scoreboard of that day is sent, so the next day's games never reach a client still
+    # showing the previous one.
+    selected_date = request.args.get("date")
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many open score streams"}), 503
+
+    def events():
+        sent = {}
+        sequence = None
+        deadline = time.monotonic() + SCORE_STREAM_MAX_AGE
+        # how long the browser waits before reconnecting once the stream ends
+        yield "retry: 1000\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            latest = scoreboard_poller.wait_for_change(sequence, timeout=min(SCORE_STREAM_KEEPALIVE, remaining))
+            if latest == sequence:
+                yield ": keepalive\n\n"
+                continue
+            sequence = latest
+            snapshot = scoreboard_poller.snapshot()
+            if snapshot is None or (selected_date and snapshot['gameDate'] != selected_date):
+                continue
+            changed = {}
+            for game in snapshot['games']:
+                box = make_boxscore(game, snapshot['lastPlays'].get(game['gameId'], ""))
+                if sent.get(box['id']) != box:
+                    changed[box['id']] = box
+            if changed:
+                sent.update(changed)
+                yield f"id: {sequence}\ndata: {json.dumps(changed)}\n\n"
+
+    response = Response(stream_with_context(events()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # runs when the connection closes, whether the stream ended or the client went away
+    response.call_on_close(stream_slots.release)
+    return response
+
+
+def make_boxscore(game, last_play):
+    game_id = game['gameId']
+    visitor_abbr = game['awayTeam']['teamTricode']
+    home_abbr = game['homeTeam']['teamTricode']
+    game_status = game['gameStatus']
+
+    return {
+        'id': game_id,
+        'visitorTeam': {
+            'name': game['awayTeam']['teamName'],
+            'abbreviation': visitor_abbr,
+            'score': game['awayTeam']['score'],
+            'color': '#AAAAAA',
+            'winProb': None
+        },
+        'homeTeam': {
+            'name': game['homeTeam']['teamName'],
+            'abbreviation': home_abbr,
+            'score': game['homeTeam']['score'],
+            'color': '#BBBBBB',
+            'winProb': None
+        },
+        'gameState': game_status,
+        'gameStatusText': game['gameStatusText'] if game_status != 3 else "",
+        'lastPlay' : last_play
+    }
+
+
+def fetch_last_play(game_id, cache_buster):
+    try:
+        url = f'https://cdn.nba.com/static/json/liveData/playbyplay/playbyplay_{game_id}.json?t={cache_buster}'
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/117.0",
+            "Accept": "application/json, text/plain, */*",
+            "Referer": "https://www.nba.com/",
+            "Origin": "https://www.nba.com",
+        }
+        response = session.get(url, headers=headers, timeout=PLAY_BY_PLAY_TIMEOUT)
+        data = response.json()
+        return data['game']['actions'][-1]['description']
+    except Exception as e:
+        print(f"error: Failed to get play by play data: {e}")
+        return ""
+
+
+def fetch_last_plays(game_ids, cache_buster):
+    # a slow or failing feed only leaves its own game's lastPlay empty
+    futures = {game_id: play_by_play_executor.submit(fetch_last_play, game_id, cache_buster) for game_id in game_ids}
+    return {game_id: future.result() for game_id, future in futures.items()}
+
 PORT = int(os.environ.get("PORT", 5000))
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=PORT, debug=False)
@@ -0,0 +1,61 @@
+import os
+import sys
+import timeit
+import warnings
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from data_process import (group_keys, ewm_configs, inject_lineups, add_player_rolling, add_lineup_features,
+                          add_schedule_features, add_per_possession, ewm_columns, add_ewm_features)
+from synthetic import load_synthetic
+from legacy import find_weighted_team_averages
+from utils import computeStreakRecord
+
+# Compares the six groupby.apply(find_weighted_team_averages) passes that process_data used to run
+# with the single multi-span pass in add_ewm_features
+
+
+def pre_ewm_frame(seed=0, start_year=2025):
+    df, player_df, scraped_df = load_synthetic(seed, start_year)
+    df = inject_lineups(df, scraped_df)
+    df = add_lineup_features(df, add_player_rolling(player_df))
+    df = add_schedule_features(df)
+    df['streak'], df['record'] = computeStreakRecord(df, group_keys)
+    df.sort_values(by=['TEAM_ABBREVIATION', 'season', 'GAME_DATE'], ascending=[True, True, True], inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return add_per_possession(df)
+
+
+def apply_path(df):
+    selected_columns = ewm_columns(df)
+    copy = df.copy()
+    ewm_features = []
+    for span, context, prefix in ewm_configs:
+        temp = (
+            copy
+            .groupby(group_keys, group_keys=False)
+            .apply(find_weighted_team_averages, span=span, context=context, cols=selected_columns, include_groups=False)
+            .add_prefix(prefix)
+        )
+        ewm_features.append(temp)
+    return pd.concat([df] + ewm_features, axis=1)
+
+
+def main(seasons=(1, 3), number=1):
+    warnings.simplefilter('ignore')
+    for count in seasons:
+        df = pd.concat([pre_ewm_frame(seed=year, start_year=year) for year in range(2025 - count + 1, 2026)],
+                       ignore_index=True)
+        pd.testing.assert_frame_equal(apply_path(df), add_ewm_features(df), check_exact=True)
+
+        looped = min(timeit.repeat(lambda: apply_path(df), number=number, repeat=3)) / number
+        single = min(timeit.repeat(lambda: add_ewm_features(df), number=number, repeat=3)) / number
+        print(f"{count} season(s), {len(df)} rows x {len(ewm_columns(df))} columns: "
+              f"apply {looped * 1e3:8.1f} ms, single pass {single * 1e3:7.1f} ms ({looped / single:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
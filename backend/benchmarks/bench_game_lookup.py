@@ -0,0 +1,47 @@
+import os
+import sys
+import timeit
+import warnings
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from configs import features
+from data_process import process_data
+from game_index import GameIndex
+from synthetic import load_synthetic
+
+# Compares the per-request boolean scan that get_predictions used to do with the GameIndex lookup
+
+
+def scan_lookup(feature_df, gameid):
+    game_rows = feature_df[((feature_df['next_GAME_ID'] == gameid) & (feature_df['next_home'] == 1))]
+    return game_rows[features].iloc[0].to_dict()
+
+
+def main(number=200):
+    warnings.simplefilter('ignore')
+    feature_df = process_data(*load_synthetic())
+    start = timeit.default_timer()
+    game_index = GameIndex(feature_df, features)
+    build = timeit.default_timer() - start
+
+    game_ids = list(game_index.positions)
+    for gameid in game_ids:
+        expected = np.array(list(scan_lookup(feature_df, gameid).values()), dtype=np.float32)
+        assert np.array_equal(expected, game_index.rows([gameid])[0], equal_nan=True)
+
+    gameid = game_ids[len(game_ids) // 2]
+    scan = min(timeit.repeat(lambda: scan_lookup(feature_df, gameid), number=number, repeat=3)) / number
+    indexed = min(timeit.repeat(lambda: game_index.rows([gameid]), number=number, repeat=3)) / number
+
+    print(f"feature_df: {feature_df.shape[0]} rows x {feature_df.shape[1]} columns, {len(game_index)} indexed games")
+    print(f"index build:  {build * 1e3:9.3f} ms (once per feature_df)")
+    print(f"boolean scan: {scan * 1e6:9.1f} us per request")
+    print(f"GameIndex:    {indexed * 1e6:9.1f} us per request ({scan / indexed:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
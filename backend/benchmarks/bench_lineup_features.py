@@ -0,0 +1,58 @@
+import os
+import sys
+import timeit
+import warnings
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from data_process import rolling_cols, inject_lineups, add_player_rolling, add_lineup_features
+from synthetic import load_synthetic
+
+# Compares the explode + merge + groupby lineup aggregation that process_data used to run with
+# the integer-keyed gather in add_lineup_features, as seasons are added
+
+
+def explode_path(df, player_df):
+    df = df.reset_index(drop=True).sort_values("GAME_DATE")
+    games_exploded = df.explode("starters").rename(columns={"starters": "PLAYER_NAME"})
+    merged = games_exploded.merge(
+        player_df[["PLAYER_NAME", "GAME_DATE"] + rolling_cols],
+        on=["PLAYER_NAME", "GAME_DATE"],
+        how="left"
+    )
+    starter_rolling_sum = merged.groupby(['GAME_ID', 'TEAM_ABBREVIATION'])[rolling_cols].sum()
+    df = df.merge(
+        starter_rolling_sum.rename(columns=lambda x: f"lineup_{x}"),
+        on=['GAME_ID', 'TEAM_ABBREVIATION'],
+        how="left"
+    )
+    df.loc[df["starters"].isna(), [f"lineup_{col}" for col in rolling_cols]] = np.nan
+    return df
+
+
+def main(seasons=(1, 5), number=3):
+    warnings.simplefilter('ignore')
+    frames = []
+    for year in range(2025 - max(seasons) + 1, 2026):
+        df, player_df, scraped_df = load_synthetic(seed=year, start_year=year)
+        frames.append((inject_lineups(df, scraped_df), player_df))
+
+    for count in seasons:
+        df = pd.concat([frame for frame, _ in frames[-count:]])
+        player_df = add_player_rolling(pd.concat([players for _, players in frames[-count:]]))
+        # the gather adds starters in lineup order, groupby().sum() uses compensated summation
+        pd.testing.assert_frame_equal(explode_path(df, player_df), add_lineup_features(df.copy(), player_df),
+                                      rtol=1e-12)
+
+        exploded = min(timeit.repeat(lambda: explode_path(df, player_df), number=number, repeat=3)) / number
+        gathered = min(timeit.repeat(lambda: add_lineup_features(df.copy(), player_df), number=number, repeat=3)) / number
+        print(f"{count} season(s), {len(df)} games, {len(player_df)} player rows: explode/merge {exploded * 1e3:7.1f} ms, "
+              f"gather {gathered * 1e3:6.1f} ms ({exploded / gathered:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
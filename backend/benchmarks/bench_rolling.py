@@ -0,0 +1,43 @@
+import os
+import sys
+import timeit
+import warnings
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from data_process import add_player_rolling
+from synthetic import make_season
+from legacy import add_rolling
+
+# Compares the six grouped rolling passes add_player_rolling used to run with add_rolling_means
+# on a synthetic multi-season player table
+
+
+def add_rolling_path(player_df):
+    player_df = player_df.sort_values(["PLAYER_NAME", "HOME", "GAME_DATE"])
+    player_df = add_rolling(player_df, ["PLAYER_NAME", "HOME"], "WNI", [5, 10, 25], "context_")
+    player_df = player_df.sort_values(["PLAYER_NAME", "GAME_DATE"])
+    return add_rolling(player_df, ["PLAYER_NAME"], "WNI", [5, 10, 25], "")
+
+
+def main(seasons=(1, 5, 10), number=1):
+    warnings.simplefilter('ignore')
+    # the same seed keeps rosters, so players build up multi-season histories
+    tables = [make_season(seed=0, start_year=year)[2] for year in range(2025 - max(seasons) + 1, 2026)]
+
+    for count in seasons:
+        player_df = pd.concat(tables[-count:], ignore_index=True)
+        # running-sum differences round differently from pandas' compensated window sums
+        pd.testing.assert_frame_equal(add_rolling_path(player_df), add_player_rolling(player_df), rtol=1e-9, atol=1e-9)
+
+        looped = min(timeit.repeat(lambda: add_rolling_path(player_df), number=number, repeat=3)) / number
+        single = min(timeit.repeat(lambda: add_player_rolling(player_df), number=number, repeat=3)) / number
+        print(f"{count:2d} season(s), {len(player_df):7d} player rows: add_rolling x6 {looped * 1e3:7.1f} ms, "
+              f"add_rolling_means {single * 1e3:7.1f} ms ({looped / single:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import timeit
+from datetime import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from scoreboard import index_schedule
+from synthetic import make_season
+
+# Compares the per-request scan of scheduleLeagueV2 that get_nba_scores used to do with the
+# date index, for every date of a synthetic season
+
+
+def make_schedule(days=240):
+    box, _, _, _ = make_season(days=days)
+    home = box[box['MATCHUP'].str.contains('vs')]
+    game_dates = []
+    for date, games in home.groupby('GAME_DATE'):
+        year, month, day = date.split('-')
+        game_dates.append({
+            'gameDate': f"{month}/{day}/{year} 00:00:00",
+            'games': [{'gameId': game_id, 'gameStatus': 3} for game_id in games['GAME_ID']],
+        })
+    return {'leagueSchedule': {'gameDates': game_dates}}
+
+
+def scan_lookup(data, selected_date):
+    games = []
+    for day in data['leagueSchedule']['gameDates']:
+        formatted = day['gameDate'].split()[0]
+        if datetime.strptime(formatted, "%m/%d/%Y").strftime("%Y-%m-%d") == selected_date:
+            games = day['games']
+    return games
+
+
+def main(number=3):
+    data = make_schedule()
+    start = timeit.default_timer()
+    by_date = index_schedule(data)
+    build = timeit.default_timer() - start
+
+    dates = list(by_date)
+    for date in dates:
+        assert scan_lookup(data, date) is by_date[date]
+
+    scan = min(timeit.repeat(lambda: [scan_lookup(data, date) for date in dates], number=number, repeat=3)) / number
+    indexed = min(timeit.repeat(lambda: [by_date.get(date, []) for date in dates], number=number, repeat=3)) / number
+
+    print(f"schedule: {len(dates)} game dates, {sum(len(games) for games in by_date.values())} games")
+    print(f"index build: {build * 1e3:9.3f} ms (once per download)")
+    print(f"scan:        {scan / len(dates) * 1e6:9.1f} us per request")
+    print(f"index:       {indexed / len(dates) * 1e6:9.3f} us per request ({scan / indexed:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from data_process import process_data
+from partitions import SeasonPartitions
+from synthetic import load_synthetic
+from utils import season_label
+
+# Time and peak traced memory of building features over a growing number of seasons: one
+# process_data() call over every season at once, the partitioned build with an empty cache, and
+# the daily case where every finished season is read back and only the current one is rebuilt.
+
+
+def measure(build):
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(counts=(1, 2, 4, 8), last_year=2025):
+    warnings.simplefilter('ignore')
+    current = season_label(last_year)
+    raw = {}
+    for year in range(last_year - max(counts) + 1, last_year + 1):
+        df, player_df, scraped_df = load_synthetic(seed=year, start_year=year)
+        raw[season_label(year)] = (df, player_df)
+
+    print(f"{'seasons':>7}{'rows':>8}{'single s':>10}{'MB':>8}{'cold s':>9}{'MB':>8}{'daily s':>9}{'MB':>8}")
+    for count in counts:
+        seasons = [season_label(year) for year in range(last_year - count + 1, last_year + 1)]
+        with tempfile.TemporaryDirectory() as tmp:
+            root = os.path.join(tmp, "partitions")
+            partitions = SeasonPartitions(lambda season: raw[season], current, root=root)
+
+            def single():
+                df = pd.concat([raw[season][0] for season in seasons])
+                player_df = pd.concat([raw[season][1] for season in seasons])
+                return process_data(df, player_df, scraped_df)
+
+            def cold():
+                shutil.rmtree(root, ignore_errors=True)
+                return partitions.load(seasons, scraped_df)
+
+            expected, single_time, single_peak = measure(single)
+            _, cold_time, cold_peak = measure(cold)
+            # cold() left every finished season cached, from here on only the current one is rebuilt
+            result, daily_time, daily_peak = measure(lambda: partitions.load(seasons, scraped_df))
+            pd.testing.assert_frame_equal(expected, result, check_exact=True, check_categorical=False)
+
+        print(f"{count:>7}{len(result):>8}{single_time:>10.2f}{single_peak / 1e6:>8.0f}"
+              f"{cold_time:>9.2f}{cold_peak / 1e6:>8.0f}{daily_time:>9.2f}{daily_peak / 1e6:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import timeit
+import warnings
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from data_process import group_keys
+from synthetic import load_synthetic
+from legacy import computeStreak, computeRecord
+from utils import computeStreakRecord
+
+# Compares the groupby.apply(computeStreak/computeRecord) loops with computeStreakRecord
+# as the number of backfilled seasons grows
+
+
+def apply_path(df):
+    streak = df.groupby(group_keys, group_keys=False).apply(computeStreak, include_groups=False)
+    record = df.groupby(group_keys, group_keys=False).apply(computeRecord, include_groups=False)
+    return streak, record
+
+
+def main(seasons=(1, 5, 10), number=3):
+    warnings.simplefilter('ignore')
+    frames = [load_synthetic(seed=year, start_year=year)[0] for year in range(2025 - max(seasons) + 1, 2026)]
+
+    for count in seasons:
+        df = pd.concat(frames[-count:])[['TEAM_ABBREVIATION', 'season', 'GAME_DATE', 'WL']]
+        df = df.sort_values('GAME_DATE', kind='stable')
+
+        streak, record = computeStreakRecord(df, group_keys)
+        expected_streak, expected_record = apply_path(df)
+        pd.testing.assert_series_equal(streak, expected_streak[df.index], check_exact=True)
+        pd.testing.assert_series_equal(record, expected_record[df.index], check_exact=True)
+
+        looped = min(timeit.repeat(lambda: apply_path(df), number=number, repeat=3)) / number
+        vectorized = min(timeit.repeat(lambda: computeStreakRecord(df, group_keys), number=number, repeat=3)) / number
+        print(f"{count:2d} season(s), {len(df):6d} rows: apply {looped * 1e3:8.1f} ms, "
+              f"vectorized {vectorized * 1e3:6.1f} ms ({looped / vectorized:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import pandas as pd
+
+# The groupby/apply versions of the feature helpers that process_data ran before they were
+# vectorized. Only the benchmarks and tests use them, as the reference the new code is checked against.
+
+
+def add_rolling(df, group_cols, value_col, windows, prefix):
+    for w in windows:
+        df[f"{prefix}{w}_rolling_{value_col}"] = (
+            df.groupby(group_cols)[value_col]
+              .rolling(window=w, min_periods=1)
+              .mean()
+              .reset_index(level=list(range(len(group_cols))), drop=True)
+        )
+    return df
+
+
+def find_weighted_team_averages(team, span, context, cols):
+  team = team.copy()
+  if context==1:
+    homeMasked = team[cols].where(team['home'] == 1)
+    awayMasked = team[cols].where(team['home'] == 0)
+
+    ewmaHome = homeMasked.ewm(span=span, adjust=False).mean()
+    ewmaAway = awayMasked.ewm(span=span, adjust=False).mean()
+
+    out = ewmaHome.where(team['next_home'] == 1, ewmaAway)
+    out = out.mask(team['next_home'].isna())
+  else:
+    out = team[cols].ewm(span=span, adjust=False).mean()
+  return out
+
+
+def computeStreak(group):
+    streak = 0
+    streak_list = []
+    for result in group['WL']:
+        if result == 1:
+            streak = streak + 1 if streak >= 0 else 1
+        else:
+            streak = streak - 1 if streak <= 0 else -1
+        streak_list.append(streak)
+    # Return a Series with the same index
+    return pd.Series(streak_list, index=group.index)
+
+
+def computeRecord(group):
+    wins = 0
+    losts = 0
+    record_list = []
+    for result in group['WL']:
+      if result == 1:
+        wins+=1
+      else:
+        losts+=1
+      record_list.append(wins/(wins+losts))
+    return pd.Series(record_list, index = group.index)
+
@@ -0,0 +1,74 @@
+import os
+import sys
+import tracemalloc
+import warnings
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from data_process import (inject_lineups, add_player_rolling, add_lineup_features, add_schedule_features,
+                          add_streak_record, add_per_possession, add_ewm_features, attach_opponents, compact_features)
+from synthetic import load_synthetic
+
+# Peak traced memory of every process_data stage and the size of the frame it hands on, next to
+# the baseline before features were compacted: identifiers kept as object columns, features as
+# float64, and attach_opponents followed by the two full copies it used to make.
+# tracemalloc sees numpy and pandas buffers, so the peaks include temporary copies.
+
+
+def baseline_opponents(df):
+    df = attach_opponents(df).copy()
+    return df.copy()
+
+
+def run(stages, df):
+    # [(stage, peak MB, frame MB, columns)] for one pass over the stages
+    tracemalloc.start()
+    rows = [('load', None, frame_mb(df), df.shape[1])]
+    overall = 0
+    for name, stage in stages:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        df = stage(df)
+        peak = tracemalloc.get_traced_memory()[1]
+        overall = max(overall, peak)
+        rows.append((name, (peak - before) / 1e6, frame_mb(df), df.shape[1]))
+    tracemalloc.stop()
+    return rows, overall / 1e6, df
+
+
+def frame_mb(df):
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def main(seed=0):
+    warnings.simplefilter('ignore')
+    _, player_df, scraped_df = load_synthetic(seed)
+
+    stages = [
+        ('inject_lineups', lambda df: inject_lineups(df, scraped_df)),
+        ('lineup features', lambda df: add_lineup_features(df, add_player_rolling(player_df))),
+        ('schedule features', add_schedule_features),
+        ('streak / record', add_streak_record),
+        ('per possession', add_per_possession),
+        ('ewm features', add_ewm_features),
+        ('attach opponents', attach_opponents),
+        ('compact features', compact_features),
+    ]
+    baseline = dict(stages, **{'attach opponents': baseline_opponents, 'compact features': lambda df: df})
+    # each pass starts from a freshly loaded frame, the stages modify the one they are given
+    before, before_overall, before_df = run(list(baseline.items()), load_synthetic(seed)[0])
+    after, after_overall, after_df = run(stages, load_synthetic(seed)[0])
+
+    print(f"{'':<20}{'peak MB':>18}{'frame MB':>18}")
+    print(f"{'stage':<20}{'before':>9}{'after':>9}{'before':>9}{'after':>9}{'columns':>9}")
+    for (name, peak_before, mb_before, _), (_, peak_after, mb_after, columns) in zip(before, after):
+        peaks = f"{peak_before:>9.1f}{peak_after:>9.1f}" if peak_before is not None else f"{'':>18}"
+        print(f"{name:<20}{peaks}{mb_before:>9.1f}{mb_after:>9.1f}{columns:>9}")
+    print(f"overall peak: {before_overall:.1f} MB before, {after_overall:.1f} MB after")
+    print(f"object columns: {(before_df.dtypes == 'object').sum()} before, {(after_df.dtypes == 'object').sum()} after; "
+          f"float32 columns: {(after_df.dtypes == 'float32').sum()}, categorical columns: {(after_df.dtypes == 'category').sum()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+import warnings
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from bench_ewm import pre_ewm_frame
+from data_process import group_keys, process_data, add_player_rolling, add_ewm_features, ewm_columns
+from feature_store import write_snapshot
+from synthetic import (load_synthetic_seasons, schedule_payload, scoreboard_payload, play_by_play_payload)
+from legacy import add_rolling, find_weighted_team_averages
+from response_cache import response_cache
+
+# Offline benchmark suite for the load/process/serve path on synthetic seasons. Results can be saved
+# as a baseline and later runs compared against it:
+#   python suite.py --save main                 time everything, write baselines/main.json
+#   python suite.py --compare main              exit 1 if a benchmark got slower than --tolerance
+#   python suite.py --seasons 1 5 10 --only process_data
+# Timings only compare on the same machine; the baseline records where it was taken.
+
+BASELINE_DIR = os.path.join(current_dir, "baselines")
+
+
+class StubUpstream(BaseAdapter):
+    """
+    Transport adapter that answers every request app.py sends: the cdn.nba.com scoreboard, schedule
+    and play-by-play feeds from synthetic payloads, and the prediction service with a deterministic
+    score, so the app boots and serves without network access.
+    """
+
+    def __init__(self, df, scraped_df):
+        super().__init__()
+        self.payloads = {
+            'todaysScoreboard': json.dumps(scoreboard_payload(scraped_df)).encode(),
+            'scheduleLeagueV2': json.dumps(schedule_payload(df, scraped_df)).encode(),
+        }
+        self.requests = 0
+
+    @staticmethod
+    def score(row):
+        return float(1 / (1 + np.exp(-np.tanh(np.nansum(np.asarray(row, dtype=np.float64)) / 1000))))
+
+    def respond(self, request, status, content):
+        response = requests.Response()
+        response.status_code = status
+        response._content = content
+        response.headers['Content-Type'] = 'application/json'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def send(self, request, **kwargs):
+        self.requests += 1
+        path = urlsplit(request.url).path
+        if path.endswith('/predict-batch'):
+            rows = json.loads(request.body)['rows']
+            return self.respond(request, 200, json.dumps({'home_win_probs': [self.score(row) for row in rows]}).encode())
+        if path.endswith('/predict'):
+            row = json.loads(request.body)['row']
+            return self.respond(request, 200, json.dumps({'home_win_prob': self.score(list(row.values()))}).encode())
+        if 'playbyplay_' in path:
+            game_id = path.rsplit('_', 1)[1].split('.')[0]
+            return self.respond(request, 200, json.dumps(play_by_play_payload(game_id)).encode())
+        for key, content in self.payloads.items():
+            if key in path:
+                return self.respond(request, 200, content)
+        return self.respond(request, 404, b'{}')
+
+    def close(self):
+        pass
+
+
+def measure(func, repeat, number=1):
+    # one untimed call first, so a benchmark does not pay for warming up caches and the allocator
+    # depending on which benchmarks ran before it
+    func()
+    times = [seconds / number for seconds in timeit.repeat(func, number=number, repeat=repeat)]
+    return {'min': min(times), 'median': statistics.median(times), 'repeat': repeat, 'number': number}
+
+
+def pipeline_benchmarks(seasons):
+    # {name: (func, number)}; the historical helpers next to the functions that replaced them
+    df, player_df, scraped_df = load_synthetic_seasons(seasons)
+    ewm_df = pd.concat([pre_ewm_frame(seed=year, start_year=year) for year in range(2025 - seasons + 1, 2026)],
+                       ignore_index=True)
+    selected_columns = ewm_columns(ewm_df)
+    sorted_players = player_df.sort_values(["PLAYER_NAME", "GAME_DATE"])
+
+    def team_averages():
+        return (ewm_df.groupby(group_keys, group_keys=False)
+                .apply(find_weighted_team_averages, span=10, context=1, cols=selected_columns, include_groups=False))
+
+    return {
+        # process_data sorts and reindexes its input frame in place
+        f"process_data[{seasons}]": (lambda: process_data(df.copy(), player_df, scraped_df), 1),
+        f"add_rolling[{seasons}]": (lambda: add_rolling(sorted_players, ["PLAYER_NAME"], "WNI", [5, 10, 25], ""), 1),
+        f"add_player_rolling[{seasons}]": (lambda: add_player_rolling(player_df), 1),
+        f"find_weighted_team_averages[{seasons}]": (team_averages, 1),
+        f"add_ewm_features[{seasons}]": (lambda: add_ewm_features(ewm_df), 1),
+    }
+
+
+@contextmanager
+def stub_upstream(stub):
+    # every requests.Session of this process sends through stub until the block exits
+    get_adapter = requests.Session.get_adapter
+    requests.Session.get_adapter = lambda self, url: stub
+    try:
+        yield stub
+    finally:
+        requests.Session.get_adapter = get_adapter
+
+
+@contextmanager
+def serve_benchmarks(tmp):
+    # boots app.py on one synthetic season behind StubUpstream, which answers for as long as the
+    # block is open. app is imported once per process, so this runs once per process too.
+    # Feature snapshot and response cache both live in tmp, nothing is written to the source tree.
+    store_dir = os.path.join(tmp, "feature_store")
+    cache_path = os.path.join(tmp, "response_cache.sqlite")
+    # utils already created the cache singleton at import, before the environment below is read
+    response_cache.path = cache_path
+    df, player_df, scraped_df = load_synthetic_seasons(1)
+    date = scraped_df['date'].iloc[0]
+    with stub_upstream(StubUpstream(df, scraped_df)):
+        write_snapshot(process_data(df.copy(), player_df, scraped_df), store_dir, date)
+        # no poller thread timing itself in the background; one refresh fills today's scoreboard
+        os.environ.update({'FEATURE_STORE_DIR': store_dir, 'RESPONSE_CACHE_PATH': cache_path,
+                           'INFERENCE_BACKEND': 'remote', 'SCOREBOARD_POLLER': '0'})
+        import app
+        app.scoreboard_poller.refresh()
+
+        client = app.app.test_client()
+        game_id = scraped_df['gameId'].iloc[0]
+        past_date = df['GAME_DATE'].iloc[len(df) // 2]
+
+        def uncached(send):
+            def call():
+                app.prediction_cache.clear()
+                return send()
+            return call
+
+        requests_by_name = {
+            'serve.run_calculations': (uncached(lambda: client.post('/run-calculations', json={'gameId': game_id})), 10),
+            'serve.run_calculations_cached': (lambda: client.post('/run-calculations', json={'gameId': game_id}), 100),
+            'serve.batch_by_date': (uncached(lambda: client.post(f'/run-calculations/batch?date={date}')), 10),
+            'serve.nba_scores_today': (lambda: client.get(f'/api/nba-scores?date={date}'), 100),
+            'serve.nba_scores_past': (lambda: client.get(f'/api/nba-scores?date={past_date}'), 100),
+            'serve.metrics': (lambda: client.get('/metrics'), 100),
+        }
+        for name, (func, _) in requests_by_name.items():
+            response = func()
+            if response.status_code != 200:
+                raise RuntimeError(f"{name} answered {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        yield requests_by_name
+
+
+def machine():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run(seasons, repeat, only=None, serve=True):
+    benchmarks = {}
+    for count in seasons:
+        benchmarks.update(pipeline_benchmarks(count))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, \
+            (serve_benchmarks(tmp) if serve else nullcontext({})) as served:
+        benchmarks.update(served)
+        for name, (func, number) in benchmarks.items():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            results[name] = measure(func, repeat, number)
+            print(f"{name:<40}{results[name]['min'] * 1e3:>11.2f} ms{results[name]['median'] * 1e3:>11.2f} ms median")
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'machine': machine(),
+        'seasons': list(seasons),
+        'results': results,
+    }
+
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save(report, name):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    with open(baseline_path(name), 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved baseline {baseline_path(name)}")
+
+
+def compare(report, name, tolerance):
+    # best-of-repeat times against the baseline; returns the benchmarks slower by more than tolerance
+    with open(baseline_path(name)) as f:
+        baseline = json.load(f)
+    if baseline['machine'] != report['machine']:
+        print(f"Warning: baseline {name} was taken on {baseline['machine']}")
+    regressions = []
+    print(f"{'benchmark':<40}{'baseline ms':>12}{'current ms':>12}{'ratio':>8}")
+    for bench, result in report['results'].items():
+        before = baseline['results'].get(bench)
+        if before is None:
+            print(f"{bench:<40}{'-':>12}{result['min'] * 1e3:>12.2f}{'new':>8}")
+            continue
+        ratio = result['min'] / before['min']
+        slower = ratio > 1 + tolerance
+        if slower:
+            regressions.append(bench)
+        print(f"{bench:<40}{before['min'] * 1e3:>12.2f}{result['min'] * 1e3:>12.2f}{ratio:>7.2f}x"
+              f"{'  slower' if slower else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the load/process/serve path")
+    parser.add_argument("--seasons", type=int, nargs="+", default=[1, 3], help="synthetic seasons per pipeline run (1-10)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="run the benchmarks whose name contains one of these")
+    parser.add_argument("--no-serve", action="store_true", help="skip the Flask endpoint benchmarks")
+    parser.add_argument("--save", metavar="NAME", help="write the results to baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against baselines/NAME.json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before --compare fails")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter('ignore')
+    report = run(args.seasons, args.repeat, args.only, not args.no_serve)
+    failed = compare(report, args.compare, args.tolerance) if args.compare else []
+    if args.save:
+        save(report, args.save)
+    if failed:
+        print(f"{len(failed)} benchmark(s) slower than baselines/{args.compare}.json: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import string
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Deterministic stand-in for load_data() so the pipeline can be timed without the NBA endpoints or MongoDB
+
+teams = ['ATL', 'BOS', 'BKN', 'CHA', 'CHI', 'CLE', 'DAL', 'DEN', 'DET', 'GSW', 'HOU',
+        'IND', 'LAC', 'LAL', 'MEM', 'MIA', 'MIL', 'MIN', 'NOP', 'NYK', 'OKC', 'ORL',
+        'PHI', 'PHX', 'POR', 'SAC', 'SAS', 'TOR', 'UTA', 'WAS']
+
+box_cols = ['PTS', 'FGM', 'FGA', 'FG_PCT', 'FG3M', 'FG3A', 'FG3_PCT', 'FTM', 'FTA', 'FT_PCT',
+            'OREB', 'DREB', 'REB', 'AST', 'STL', 'BLK', 'TOV', 'PF', 'PLUS_MINUS']
+
+advanced_cols = ['minutes', 'estimatedOffensiveRating', 'offensiveRating', 'estimatedDefensiveRating',
+                 'defensiveRating', 'estimatedNetRating', 'netRating', 'assistPercentage',
+                 'assistToTurnover', 'assistRatio', 'offensiveReboundPercentage',
+                 'defensiveReboundPercentage', 'reboundPercentage', 'estimatedTeamTurnoverPercentage',
+                 'turnoverRatio', 'effectiveFieldGoalPercentage', 'trueShootingPercentage',
+                 'usagePercentage', 'estimatedUsagePercentage', 'estimatedPace', 'pace', 'pacePer40',
+                 'possessions', 'PIE']
+
+
+def make_season(seed=0, start_year=2025, days=165, roster_size=13):
+    # raw frames shaped like LeagueGameFinder, the advanced/player collections and get_lineups()
+    rng = np.random.default_rng(seed)
+    rosters = {
+        team: [f"{''.join(rng.choice(list(string.ascii_uppercase), 6))} {team}{i}" for i in range(roster_size)]
+        for team in teams
+    }
+    start = datetime(start_year, 10, 21)
+    prefix = f"002{str(start_year)[-2:]}"
+
+    box_rows, advanced_rows, player_rows = [], [], []
+    number = 1
+    for day in range(days):
+        date = (start + timedelta(days=day)).strftime('%Y-%m-%d')
+        order = rng.permutation(len(teams))
+        for k in range(int(rng.integers(5, 11))):
+            home, away = teams[order[2 * k]], teams[order[2 * k + 1]]
+            game_id = f"{prefix}{number:05d}"
+            number += 1
+            home_pts, away_pts = rng.integers(90, 135, size=2)
+            if home_pts == away_pts:
+                home_pts += 1
+            for team, opp, is_home, pts, opp_pts in ((home, away, 1, home_pts, away_pts),
+                                                      (away, home, 0, away_pts, home_pts)):
+                box = dict(zip(box_cols, rng.uniform(0, 60, size=len(box_cols)).round(3)))
+                box['PTS'] = int(pts)
+                box['PLUS_MINUS'] = float(pts - opp_pts)
+                box_rows.append({
+                    'SEASON_ID': f"2{start_year}", 'TEAM_ID': teams.index(team),
+                    'TEAM_ABBREVIATION': team, 'TEAM_NAME': team, 'GAME_ID': game_id, 'GAME_DATE': date,
+                    'MATCHUP': f"{team} vs. {opp}" if is_home else f"{team} @ {opp}",
+                    'WL': 'W' if pts > opp_pts else 'L', 'MIN': 240, **box,
+                })
+                advanced = dict(zip(advanced_cols, rng.uniform(0, 120, size=len(advanced_cols)).round(3)))
+                advanced['minutes'] = '240:00'
+                advanced['possessions'] = float(rng.uniform(90, 110))
+                advanced_rows.append({**advanced, 'GAME_ID': game_id, 'TEAM_ABBREVIATION': team,
+                                      'starters': list(rng.choice(rosters[team], 5, replace=False))})
+                wni = rng.uniform(0, 8, size=roster_size)
+                wni[rng.random(roster_size) < 0.1] = np.nan
+                for name, value in zip(rosters[team], wni):
+                    player_rows.append({'PLAYER_NAME': name, 'GAME_ID': game_id, 'GAME_DATE': date,
+                                        'TEAM_ABBREVIATION': team, 'HOME': is_home, 'WNI': value})
+
+    next_date = (start + timedelta(days=days)).strftime('%Y-%m-%d')
+    order = rng.permutation(len(teams))
+    slate = []
+    for k in range(10):
+        home, away = teams[order[2 * k]], teams[order[2 * k + 1]]
+        slate.append({
+            'matchup': f"{away} @ {home}", 'away': away, 'home': home,
+            'awayLineup': list(rng.choice(rosters[away], 5, replace=False)),
+            'homeLineup': list(rng.choice(rosters[home], 5, replace=False)),
+            'date': next_date, 'gameId': f"{prefix}{number + k:05d}",
+        })
+
+    return pd.DataFrame(box_rows), pd.DataFrame(advanced_rows), pd.DataFrame(player_rows), pd.DataFrame(slate)
+
+
+def loaded_frames(box_df, advanced_df, player_df, season):
+    # the transformations load_season() applies to the raw frames
+    box_df = box_df.drop(columns=['TEAM_ID', 'TEAM_NAME', 'SEASON_ID'])
+    box_df.insert(3, "season", season)
+    box_df.insert(4, "home", box_df["MATCHUP"].str.contains("vs").astype(int))
+    box_df.insert(7, "target", None)
+    box_df['WL'] = (box_df['WL'] == 'W').astype(int)
+    box_df.sort_values(by=['TEAM_ABBREVIATION', 'season', 'GAME_DATE'], ascending=[True, True, True], inplace=True)
+    box_df.reset_index(drop=True, inplace=True)
+
+    player_df = player_df.sort_values(by=['GAME_DATE'])
+
+    df = box_df.merge(advanced_df, on=['GAME_ID', 'TEAM_ABBREVIATION'], how='left')
+    df = df.drop(columns=['minutes', 'estimatedOffensiveRating',
+                        'estimatedDefensiveRating', 'estimatedNetRating',
+                        'estimatedTeamTurnoverPercentage', 'usagePercentage',
+                        'estimatedUsagePercentage', 'estimatedPace', 'REB', 'assistPercentage',
+                        ])
+    df['idx'] = df['GAME_DATE'].astype(str) + '_' + df['TEAM_ABBREVIATION'].astype(str)
+    df.set_index('idx', inplace=True)
+    return df, player_df
+
+
+def load_synthetic(seed=0, start_year=2025, days=165):
+    # same transformations as load_data(), applied to make_season() output
+    box_df, advanced_df, player_df, scraped_df = make_season(seed, start_year, days)
+    season = f"{start_year}-{str(start_year + 1)[-2:]}"
+    df, player_df = loaded_frames(box_df, advanced_df, player_df, season)
+    return df, player_df, scraped_df
+
+
+def load_synthetic_until(season_frames, last_date):
+    # load_data() on the morning after last_date: the games played up to it, and the starters of the
+    # next day's games as the scraped lineups
+    box_df, advanced_df, player_df, _ = season_frames
+    played = box_df[box_df['GAME_DATE'] <= last_date]
+    next_date = box_df.loc[box_df['GAME_DATE'] > last_date, 'GAME_DATE'].min()
+    starters = advanced_df.set_index(['GAME_ID', 'TEAM_ABBREVIATION'])['starters']
+    slate = []
+    for game_id, game in box_df[box_df['GAME_DATE'] == next_date].groupby('GAME_ID'):
+        is_home = game['MATCHUP'].str.contains('vs')
+        home, away = game.loc[is_home, 'TEAM_ABBREVIATION'].iloc[0], game.loc[~is_home, 'TEAM_ABBREVIATION'].iloc[0]
+        slate.append({'matchup': f"{away} @ {home}", 'away': away, 'home': home,
+                      'awayLineup': list(starters[(game_id, away)]), 'homeLineup': list(starters[(game_id, home)]),
+                      'date': next_date, 'gameId': game_id})
+    start_year = int(box_df['SEASON_ID'].iloc[0][1:])
+    season = f"{start_year}-{str(start_year + 1)[-2:]}"
+    df, player_df = loaded_frames(played, advanced_df[advanced_df['GAME_ID'].isin(played['GAME_ID'])],
+                                  player_df[player_df['GAME_DATE'] <= last_date], season)
+    return df, player_df, pd.DataFrame(slate)
+
+
+def load_synthetic_seasons(seasons=1, last_year=2025, days=165):
+    # load_data()-shaped frames over several seasons (one seed per season), as SeasonPartitions.load()
+    # would join them; the upcoming lineups belong to the last season
+    loaded = [load_synthetic(seed=year, start_year=year, days=days) for year in range(last_year - seasons + 1, last_year + 1)]
+    df = pd.concat([frames[0] for frames in loaded])
+    player_df = pd.concat([frames[1] for frames in loaded])
+    return df, player_df, loaded[-1][2]
+
+
+def cdn_game(game_id, home, away, status, home_score=0, away_score=0):
+    # one game as the cdn.nba.com scoreboard and schedule feeds list it
+    status_text = {1: '7:00 pm ET', 2: 'Q2 5:00', 3: 'Final'}[status]
+    return {
+        'gameId': game_id, 'gameStatus': status, 'gameStatusText': status_text,
+        'homeTeam': {'teamTricode': home, 'teamName': home, 'score': home_score},
+        'awayTeam': {'teamTricode': away, 'teamName': away, 'score': away_score},
+    }
+
+
+def schedule_payload(df, scraped_df):
+    # scheduleLeagueV2 for a load_synthetic() frame: every played game as final, then the upcoming slate
+    by_date = {}
+    home = df[df['home'] == 1]
+    away = df[df['home'] == 0].set_index('GAME_ID')
+    for game_id, date, team, pts in zip(home['GAME_ID'], home['GAME_DATE'], home['TEAM_ABBREVIATION'], home['PTS']):
+        by_date.setdefault(date, []).append(cdn_game(game_id, team, away.at[game_id, 'TEAM_ABBREVIATION'], 3,
+                                                     int(pts), int(away.at[game_id, 'PTS'])))
+    for game in scraped_df.itertuples():
+        by_date.setdefault(game.date, []).append(cdn_game(game.gameId, game.home, game.away, 1))
+    game_dates = []
+    for date in sorted(by_date):
+        year, month, day = date.split('-')
+        game_dates.append({'gameDate': f"{month}/{day}/{year} 00:00:00", 'games': by_date[date]})
+    return {'leagueSchedule': {'gameDates': game_dates}}
+
+
+def scoreboard_payload(scraped_df, live=3):
+    # todaysScoreboard on the day of the upcoming slate, with its first `live` games in progress
+    games = [cdn_game(game.gameId, game.home, game.away, 2 if k < live else 1, 40 if k < live else 0)
+             for k, game in enumerate(scraped_df.itertuples())]
+    return {'scoreboard': {'gameDate': scraped_df['date'].iloc[0], 'games': games}}
+
+
+def play_by_play_payload(game_id, actions=400):
+    return {'game': {'gameId': game_id, 'actions': [{'actionNumber': k, 'description': f"play {k}"}
+                                                    for k in range(1, actions + 1)]}}
+
+
+def advanced_boxscore_payload(game_id, home, away, players=8):
+    # stats.nba.com boxscoreadvancedv3 response as boxscore_rows() reads it
+    def team(code, seed):
+        rng = np.random.default_rng(seed)
+        return {'teamTricode': code, 'statistics': {'PIE': float(rng.uniform(.4, .6)), 'pace': float(rng.uniform(95, 105))},
+                'players': [{'firstName': code, 'familyName': f"Player {k}", 'comment': '' if k < players - 1 else 'DNP - Rest',
+                             'statistics': {'PIE': float(rng.uniform(0, .2)), 'usagePercentage': float(rng.uniform(.1, .3)),
+                                            'minutes': f"{rng.integers(10, 40)}:{rng.integers(0, 60):02d}" if k < players - 1 else ''}}
+                            for k in range(players)]}
+
+    seed = int(game_id[-5:])
+    return {'boxScoreAdvanced': {'gameId': game_id, 'homeTeam': team(home, seed), 'awayTeam': team(away, seed + 1)}}
@@ -11,33 +11,51 @@ from bs4 import BeautifulSoup
 import unicodedata
 from nba_api.stats.endpoints import leaguegamefinder, boxscoreadvancedv3
 from nba_api.live.nba.endpoints import scoreboard
-from utils import strip, WNI, rate_limited_call, get_lineups
+from utils import strip, WNI, get_lineups, season_of_date, game_id_prefix
+from metrics import stage, traced
 from tqdm import tqdm
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 import os
 import sys
 
-def load_data():
-    teams = ['ATL', 'BOS', 'BKN', 'CHA', 'CHI', 'CLE', 'DAL', 'DEN', 'DET', 'GSW', 'HOU',
-            'IND', 'LAC', 'LAL', 'MEM', 'MIA', 'MIL', 'MIN', 'NOP', 'NYK', 'OKC', 'ORL',
-            'PHI', 'PHX', 'POR', 'SAC', 'SAS', 'TOR', 'UTA', 'WAS']
+CURRENT_SEASON = os.environ.get("NBA_SEASON") or season_of_date(datetime.now())
+MONGO_BATCH_SIZE = int(os.environ.get("MONGO_BATCH_SIZE", 5000))
 
-    drop_cols = ['TEAM_ID', 'TEAM_NAME', 'SEASON_ID']
+# fields read from the collections; advanced stats dropped by load_season() are never fetched
+player_fields = ['PLAYER_NAME', 'GAME_ID', 'GAME_DATE', 'TEAM_ABBREVIATION', 'HOME', 'WNI']
+advanced_fields = ['offensiveRating', 'defensiveRating', 'netRating', 'assistToTurnover', 'assistRatio',
+                   'offensiveReboundPercentage', 'defensiveReboundPercentage', 'reboundPercentage',
+                   'turnoverRatio', 'effectiveFieldGoalPercentage', 'trueShootingPercentage', 'pace',
+                   'pacePer40', 'possessions', 'PIE', 'GAME_ID', 'TEAM_ABBREVIATION', 'starters']
 
+def read_frame(collection, query, fields, batch_size=MONGO_BATCH_SIZE):
+    # streams the projected documents in batches straight into per-field columns
+    columns = {field: [] for field in fields}
+    projection = {field: 1 for field in fields}
+    projection['_id'] = 0
+    for doc in collection.find(query, projection).batch_size(batch_size):
+        for field, values in columns.items():
+            values.append(doc.get(field))
+    return pd.DataFrame(columns)
 
-    #get boxscores across every season in seasons
 
-    gamefinder = leaguegamefinder.LeagueGameFinder(
-        league_id_nullable='00',
-        season_nullable='2025-26',
-        season_type_nullable='Regular Season',
-    )
-    
-    box_df = gamefinder.get_data_frames()[0]
+@traced("load_season")
+def load_season(season):
+    # the merged box/advanced frame and the player rows of one regular season
+    drop_cols = ['TEAM_ID', 'TEAM_NAME', 'SEASON_ID']
+
+    with stage("load.league_game_finder") as timed:
+        gamefinder = leaguegamefinder.LeagueGameFinder(
+            league_id_nullable='00',
+            season_nullable=season,
+            season_type_nullable='Regular Season',
+        )
+        box_df = gamefinder.get_data_frames()[0]
+        timed.rows = len(box_df)
     box_df.dropna(subset=['WL'], inplace = True)
     box_df = box_df.drop(columns=drop_cols)
-    box_df.insert(3, "season", '2025-26')
+    box_df.insert(3, "season", season)
     box_df.insert(4, "home", box_df["MATCHUP"].str.contains("vs").astype(int))
     box_df.insert(7, "target", None)
     box_df['WL'] = (box_df['WL'] == 'W').astype(int)
@@ -50,24 +68,31 @@ def load_data():
         client = MongoClient(uri, server_api=ServerApi('1'))
         playerCollection = client['player']['dataframe']
         advancedCollection = client['advanced']['dataframe']
-        player_df = pd.DataFrame(list(playerCollection.find({}, {'_id': 0})))
-        advanced_df = pd.DataFrame(list(advancedCollection.find({}, {'_id': 0})))
+        # the collections hold every stored season, a season's rows share a GAME_ID prefix
+        season_filter = {'GAME_ID': {'$regex': f"^{game_id_prefix(season)}"}}
+        with stage("load.mongo.player") as timed:
+            player_df = read_frame(playerCollection, season_filter, player_fields)
+            timed.rows = len(player_df)
+        with stage("load.mongo.advanced") as timed:
+            advanced_df = read_frame(advancedCollection, season_filter, advanced_fields)
+            timed.rows = len(advanced_df)
     except Exception as e:
         print(f"Error fetching from mongodb: {e}")
         return
     
     player_df = player_df.sort_values(by=['GAME_DATE'])
-    scraped_df = get_lineups()
 
     df = box_df.merge(advanced_df, on=['GAME_ID', 'TEAM_ABBREVIATION'], how='left')
-    df = df.drop(columns=['minutes', 'estimatedOffensiveRating',
-                        'estimatedDefensiveRating', 'estimatedNetRating',
-                        'estimatedTeamTurnoverPercentage', 'usagePercentage',
-                        'estimatedUsagePercentage', 'estimatedPace', 'REB', 'assistPercentage',
-                        ])
+    df = df.drop(columns=['REB'])
     df['idx'] = df['GAME_DATE'].astype(str) + '_' + df['TEAM_ABBREVIATION'].astype(str)
     df.set_index('idx', inplace=True)
 
-    return df, player_df, scraped_df
+    return df, player_df
 
 
+def load_lineups():
+    # today's starting lineups, joined to the current season by process_data()
+    with stage("load.lineups") as timed:
+        scraped_df = get_lineups()
+        timed.rows = len(scraped_df) if scraped_df is not None else None
+    return scraped_df
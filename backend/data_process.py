@@ -1,187 +1,265 @@
+import sys
+from itertools import chain
+
 import pandas as pd
 import numpy as np
 
-from utils import add_rolling, computeStreak, computeRecord, find_weighted_team_averages
-
-
-def process_data(df, player_df, scraped_df):
-    for _, row in scraped_df.iterrows():
-        GAME_DATE = row['date']
-        home = row['home']
-        away = row['away']
-        # HOME
-
-        idx = f"{GAME_DATE}_{home}"
-        df.at[idx, 'season'] = '2025-26'
-        df.at[idx, 'MATCHUP'] = f"{home} vs. {away}"
-        df.at[idx, 'home'] = 1
-        df.at[idx, 'GAME_DATE'] = GAME_DATE
-        df.at[idx, 'TEAM_ABBREVIATION'] = home
-        df.at[idx, 'starters'] = row['homeLineup']
-        df.at[idx, 'GAME_ID'] = row['gameId']
-
-        # AWAY
-        idx = f"{GAME_DATE}_{away}"
-
-        df.at[idx, 'season'] = '2025-26'
-        df.at[idx, 'MATCHUP'] = f"{away} @ {home}"
-        df.at[idx, 'home'] = 0
-        df.at[idx, 'GAME_DATE'] = GAME_DATE
-        df.at[idx, 'TEAM_ABBREVIATION'] = away
-        df.at[idx, 'starters'] = row['awayLineup']
-        df.at[idx, 'GAME_ID'] = row['gameId']
+from utils import add_rolling_means, computeStreakRecord, ewm_multi_span, season_of_game_ids
+from metrics import traced
+
+
+group_keys = ['TEAM_ABBREVIATION', 'season']
+
+rolling_cols = [
+    "context_5_rolling_WNI",
+    "context_10_rolling_WNI",
+    "context_25_rolling_WNI",
+    "5_rolling_WNI",
+    "10_rolling_WNI",
+    "25_rolling_WNI"
+]
+
+GameTotals = ['PTS', 'STL', 'BLK', 'TOV', 'AST', 'PF', 'FGM', 'FGA', 'FG3M', 'FG3A', 'FTA', 'FTM', 'DREB', 'OREB']
+
+# Columns to exclude when computing weighted averages
+removed_columns = ['GAME_DATE', 'MATCHUP', 'target', 'streak', 'next_home', 'WL',
+                'MIN', 'TEAM_ABBREVIATION', 'season', 'home', "context_5_rolling_PIE",
+                "lineup_context_5_rolling_PIE",
+                "lineup_context_10_rolling_PIE",
+                "lineup_context_25_rolling_PIE",
+                "lineup_5_rolling_PIE",
+                "lineup_10_rolling_PIE",
+                "lineup_25_rolling_PIE", 'record', 'starters']
+
+# EWM configurations: (span, context, prefix)
+ewm_configs = [
+    (5, 1, "ewm5_context_"),
+    (10, 1, "ewm10_context_"),
+    (25, 1, "ewm25_context_"),
+    (5, 0, "ewm5_"),
+    (10, 0, "ewm10_"),
+    (25, 0, "ewm25_"),
+]
+ewm_spans = sorted({span for span, _, _ in ewm_configs})
+
+# identifiers repeated on every row of a team-season
+categorical_columns = ['TEAM_ABBREVIATION', 'season', 'MATCHUP']
+
+
+def lineup_rows(scraped_df):
+    # the home and away row of every upcoming game, indexed like load_data() rows by date_team
+    sides = []
+    for team, opponent, home, lineup in (('home', 'away', 1, 'homeLineup'), ('away', 'home', 0, 'awayLineup')):
+        rows = pd.DataFrame({
+            'season': season_of_game_ids(scraped_df['gameId']).to_numpy(),
+            'MATCHUP': scraped_df[team] + (' vs. ' if home else ' @ ') + scraped_df[opponent],
+            'home': home,
+            'GAME_DATE': scraped_df['date'],
+            'TEAM_ABBREVIATION': scraped_df[team],
+            'starters': scraped_df[lineup],
+            'GAME_ID': scraped_df['gameId'],
+        })
+        rows.index = scraped_df['date'] + '_' + scraped_df[team]
+        sides.append(rows)
+    rows = pd.concat(sides)
+    # a game listed twice keeps its last lineup
+    return rows[~rows.index.duplicated(keep='last')]
+
+
+@traced("process.inject_lineups")
+def inject_lineups(df, scraped_df):
+    if scraped_df is not None and not scraped_df.empty:
+        rows = lineup_rows(scraped_df)
+        rows.index.name = df.index.name
+        existing = rows.index.isin(df.index)
+        for column in rows.columns:
+            df.loc[rows.index[existing], column] = rows.loc[existing, column].to_numpy()
+        if not existing.all():
+            # appended rows start out empty, as with df.at, so integer columns become float
+            df = pd.concat([df, rows[~existing].astype({'home': float})])
 
     df = df.sort_values(by=['TEAM_ABBREVIATION', 'GAME_DATE'], ascending=[True, True])
 
-    df['starters'] = df.groupby(['TEAM_ABBREVIATION', 'season'])['starters'].shift(-1)
+    df['starters'] = df.groupby(group_keys)['starters'].shift(-1)
+    # one shared string per player instead of one per document
+    df['starters'] = df['starters'].map(lambda names: [sys.intern(str(name)) for name in names], na_action='ignore')
+    return df
 
-    player_df = player_df.sort_values(["PLAYER_NAME", "HOME", "GAME_DATE"])
-    player_df = add_rolling(
-        df=player_df,
-        group_cols=["PLAYER_NAME", "HOME"],
-        value_col="WNI",
-        windows=[5, 10, 25],
-        prefix="context_"
-    )
-    
-    player_df = player_df.sort_values(["PLAYER_NAME", "GAME_DATE"])
-    player_df = add_rolling(
+
+@traced("process.player_rolling")
+def add_player_rolling(player_df):
+    # within a (player, home) group, games are in date order under either sort, so one sort serves both
+    player_df = player_df.sort_values(["PLAYER_NAME", "GAME_DATE"], kind='stable')
+    player_df['PLAYER_NAME'] = player_df['PLAYER_NAME'].map(sys.intern, na_action='ignore')
+    return add_rolling_means(
         df=player_df,
-        group_cols=["PLAYER_NAME"],
+        groupings={"context_": ["PLAYER_NAME", "HOME"], "": ["PLAYER_NAME"]},
         value_col="WNI",
         windows=[5, 10, 25],
-        prefix=""
-    )
-
-    df.reset_index(inplace=True, drop=True)
-    df = df.sort_values("GAME_DATE")
-    player_df = player_df.sort_values("GAME_DATE")
-
-    rolling_cols = [
-        "context_5_rolling_WNI",
-        "context_10_rolling_WNI",
-        "context_25_rolling_WNI",
-        "5_rolling_WNI",
-        "10_rolling_WNI",
-        "25_rolling_WNI"
-    ]
-
-    games_exploded = df.explode("starters").rename(columns={"starters": "PLAYER_NAME"})
-
-    merged = games_exploded.merge(
-        player_df[["PLAYER_NAME", "GAME_DATE"] + rolling_cols],
-        on=["PLAYER_NAME", "GAME_DATE"],
-        how="left"
     )
 
 
-    starter_rolling_sum = merged.groupby(['GAME_ID', 'TEAM_ABBREVIATION'])[rolling_cols].sum()
+def lineup_sums(starters, dates, player_df):
+    # (rows, rolling_cols) sums of the starters' rolling WNI on each row's date, as the explode +
+    # merge + groupby().sum() path computed them: missing values add 0 and a (player, date) listed
+    # twice in player_df counts twice. Starters and game dates get integer ids once, player_df rows
+    # are summed per (player_id, date_id) key, and each lineup gathers its starters' keys.
+    lineups = [names if pd.api.types.is_list_like(names) else [names] for names in starters]
+    lengths = np.array([len(names) for names in lineups], dtype=np.int64)
+    flat = np.fromiter(chain.from_iterable(lineups), dtype=object, count=lengths.sum())
+    starter_ids, names = pd.factorize(flat)
+    date_ids, days = pd.factorize(np.asarray(dates, dtype=object))
+    date_ids = np.repeat(date_ids, lengths)
+
+    # only rows of players who start somewhere, on a day with a game, can be looked up
+    player_ids = pd.Index(names).get_indexer(player_df['PLAYER_NAME'])
+    player_days = pd.Index(days).get_indexer(player_df['GAME_DATE'])
+    wanted = np.flatnonzero((player_ids >= 0) & (player_days >= 0))
+    values = player_df[rolling_cols].to_numpy(dtype=np.float64)[wanted]
+    keys, key_of_row = np.unique(player_ids[wanted] * len(days) + player_days[wanted], return_inverse=True)
+    values = np.where(np.isnan(values), 0., values)
+    per_key = np.column_stack([np.bincount(key_of_row, weights=column, minlength=len(keys)) for column in values.T])
+
+    total = np.zeros((len(lineups), len(rolling_cols)))
+    if len(keys) == 0:
+        return total
+    starter_keys = starter_ids * len(days) + date_ids
+    position = np.minimum(np.searchsorted(keys, starter_keys), len(keys) - 1)
+    found = np.flatnonzero((starter_ids >= 0) & (date_ids >= 0) & (keys[position] == starter_keys))
+    rows = np.repeat(np.arange(len(lineups)), lengths)[found]
+    for j, column in enumerate(per_key[position[found]].T):
+        total[:, j] = np.bincount(rows, weights=column, minlength=len(lineups))
+    return total
+
+
+@traced("process.lineup_features")
+def add_lineup_features(df, player_df):
+    df.reset_index(inplace=True, drop=True)
+    df = df.sort_values("GAME_DATE").reset_index(drop=True)
 
-    df = df.merge(
-        starter_rolling_sum.rename(columns=lambda x: f"lineup_{x}"),
-        on=['GAME_ID', 'TEAM_ABBREVIATION'],
-        how="left"
-    )
+    lineup_cols = [f"lineup_{col}" for col in rolling_cols]
+    has_lineup = df['starters'].notna() & df['GAME_ID'].notna()
+    sums = np.full((len(df), len(rolling_cols)), np.nan)
+    sums[has_lineup.to_numpy()] = lineup_sums(df.loc[has_lineup, 'starters'], df.loc[has_lineup, 'GAME_DATE'], player_df)
+    return pd.concat([df, pd.DataFrame(sums, columns=lineup_cols, index=df.index)], axis=1)
 
-    # Optional: make sure rows with missing starters are NaN
-    df.loc[df["starters"].isna(), [f"lineup_{col}" for col in rolling_cols]] = np.nan
 
-    df['target'] = df.groupby(['TEAM_ABBREVIATION', 'season'])['WL'].shift(-1).astype('Int64')
-    df['next_home'] = df.groupby(['TEAM_ABBREVIATION', 'season'])['home'].shift(-1).astype('Int64')
+@traced("process.schedule_features")
+def add_schedule_features(df):
+    df['target'] = df.groupby(group_keys)['WL'].shift(-1).astype('Int64')
+    df['next_home'] = df.groupby(group_keys)['home'].shift(-1).astype('Int64')
     df['GAME_DATE'] = pd.to_datetime(df['GAME_DATE'], format='%Y-%m-%d')
-    df['next_GAME_DATE'] = df.groupby(['TEAM_ABBREVIATION', 'season'])['GAME_DATE'].shift(-1)
+    df['next_GAME_DATE'] = df.groupby(group_keys)['GAME_DATE'].shift(-1)
 
     df['rest_days'] = (df['next_GAME_DATE'] - df['GAME_DATE']).dt.days-1
-    df['recent_intensity'] = (
-        df.groupby(['TEAM_ABBREVIATION', 'season'])['GAME_DATE']
-        .transform(lambda x: 4 / ((x - x.shift(3)).dt.days + 1))
-    )
+    df['recent_intensity'] = 4 / ((df['GAME_DATE'] - df.groupby(group_keys)['GAME_DATE'].shift(3)).dt.days + 1)
     df['GAME_DATE'] = df['GAME_DATE'].dt.strftime('%Y-%m-%d')
     df = df.drop(columns=['next_GAME_DATE'])
+    return df
+
 
-    df['streak'] = 0
-    df['streak'] = df.groupby(['TEAM_ABBREVIATION', 'season'], group_keys=False).apply(computeStreak, include_groups=False)
-    df['record'] = 0
-    df['record'] = df.groupby(['TEAM_ABBREVIATION', 'season'], group_keys=False).apply(computeRecord, include_groups=False)
+@traced("process.streak_record")
+def add_streak_record(df):
+    df['streak'], df['record'] = computeStreakRecord(df, group_keys)
     df.sort_values(by=['TEAM_ABBREVIATION', 'season', 'GAME_DATE'], ascending=[True, True, True], inplace=True)
     df.reset_index(drop=True, inplace=True)
+    return df
 
 
-    GameTotals = ['PTS', 'STL', 'BLK', 'TOV', 'AST', 'PF', 'FGM', 'FGA', 'FG3M', 'FG3A', 'FTA', 'FTM', 'DREB', 'OREB']
+@traced("process.per_possession")
+def add_per_possession(df):
     ppColumns = [f"pp_{col}" for col in GameTotals]
     df[ppColumns] = df[GameTotals].div(df['possessions'], axis=0)
     df.drop(columns=GameTotals, inplace=True)
-
-    # Columns to exclude when computing weighted averages
-    removed_columns = ['GAME_DATE', 'MATCHUP', 'target', 'streak', 'next_home', 'WL',
-                    'MIN', 'TEAM_ABBREVIATION', 'season', 'home', "context_5_rolling_PIE",
-                    "lineup_context_5_rolling_PIE",
-                    "lineup_context_10_rolling_PIE",
-                    "lineup_context_25_rolling_PIE",
-                    "lineup_5_rolling_PIE",
-                    "lineup_10_rolling_PIE",
-                    "lineup_25_rolling_PIE", 'record', 'starters']
-
-    selected_columns = df.columns[~df.columns.isin(removed_columns)]
-
-
-    # EWM configurations
-    configs = [
-        (5, 1, "ewm5_context_", selected_columns),
-        (10, 1, "ewm10_context_", selected_columns),
-        (25, 1, "ewm25_context_", selected_columns),
-        (5, 0, "ewm5_", selected_columns),
-        (10, 0, "ewm10_", selected_columns),
-        (25, 0, "ewm25_", selected_columns),
-    ]
-
-    # Compute EWM features
-    copy = df.copy()
-    ewm_features = []
-
-    for span, context, prefix, cols in configs:
-        temp = (
-            copy
-            .groupby(["TEAM_ABBREVIATION", "season"], group_keys=False)
-            .apply(find_weighted_team_averages, span=span, context=context, cols=cols, include_groups=False)
-            .add_prefix(prefix)
-        )
-        ewm_features.append(temp)
-
-    # Concatenate EWM features back to main dataframe
-    df = pd.concat([df] + ewm_features, axis=1)
+    return df
 
 
-    selected_columns = [column for column in df.columns if ('ewm' in column or 'lineup' in column)] + ['rest_days', 'recent_intensity', 'streak']
-    game_features = df[['TEAM_ABBREVIATION', 'GAME_DATE', 'season', 'GAME_ID']+selected_columns].copy()
+def ewm_columns(df):
+    return df.columns[~df.columns.isin(removed_columns)]
 
-    game_features[selected_columns] = game_features.groupby(['TEAM_ABBREVIATION', 'season'])[selected_columns].shift(1)
-    game_features = game_features.rename(columns={c: f"opp_{c}" for c in selected_columns})
-
-    df['next_game_date'] =  df.groupby(['TEAM_ABBREVIATION', 'season'])['GAME_DATE'].shift(-1)
-    df['next_opp'] = df.groupby(['TEAM_ABBREVIATION', 'season'])['MATCHUP'].shift(-1).str[-3:]
-
-
-    result = df.merge(
-        game_features,
-        left_on=['next_game_date', 'next_opp'],
-        right_on=['GAME_DATE', 'TEAM_ABBREVIATION'],
-        how='left',
-        suffixes=('', '_drop')
-    )
 
+def ewm_contexts(df, selected_columns):
+    # (rows, 3, columns): the values of home games only, of away games only and of every game
+    values = df[selected_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    home = df['home'].to_numpy(dtype=np.float64)[:, None]
+    return np.stack([np.where(home == 1, values, np.nan), np.where(home == 0, values, np.nan), values], axis=1)
 
-    result = result.drop(columns=
-    [
-    'TEAM_ABBREVIATION_drop',
-    'GAME_DATE_drop',
-    'season_drop',
-    'GAME_ID_drop',
-    'next_opp',
-    'next_game_date',
-    ])
-    df = result.copy()
 
+def ewm_frames(ewm, df, selected_columns):
+    # ewm is ewm_multi_span() of ewm_contexts() per row, (rows, spans, 3, columns); context
+    # features follow the venue of the team's next game
+    next_home = df['next_home'].to_numpy(dtype=np.float64, na_value=np.nan)[:, None]
+    ewm_features = []
+    for span, context, prefix in ewm_configs:
+        s = ewm_spans.index(span)
+        if context == 1:
+            out = np.where(next_home == 1, ewm[:, s, 0], ewm[:, s, 1])
+            out[np.isnan(next_home[:, 0])] = np.nan
+        else:
+            out = ewm[:, s, 2]
+        ewm_features.append(pd.DataFrame(out, columns=selected_columns, index=df.index).add_prefix(prefix))
+    return ewm_features
+
+
+@traced("process.ewm")
+def add_ewm_features(df):
+    selected_columns = ewm_columns(df)
+    contexts = ewm_contexts(df, selected_columns)
+
+    # lay the team-seasons side by side on a (game number, team-season) grid so one pass over
+    # game numbers advances every team, span and context together
+    grouped = df.groupby(group_keys, sort=False)
+    teams = grouped.ngroup().to_numpy()
+    games = grouped.cumcount().to_numpy()
+    grid = np.full((games.max() + 1, teams.max() + 1) + contexts.shape[1:], np.nan)
+    grid[games, teams] = contexts
+    ewm, _, _ = ewm_multi_span(grid, ewm_spans)
+
+    return pd.concat([df] + ewm_frames(ewm[games, :, teams], df, selected_columns), axis=1)
+
+
+def opponent_columns(df):
+    return [column for column in df.columns if ('ewm' in column or 'lineup' in column)] + ['rest_days', 'recent_intensity', 'streak']
+
+
+def opponent_rows(df):
+    # position of the row holding each row's next opponent's features going into that game
+    # (the opponent's previous game), -1 when there is none
+    positions = pd.Series(np.arange(len(df)), index=df.index)
+    grouped = positions.groupby([df[key] for key in group_keys])
+    previous = grouped.shift(1, fill_value=-1).to_numpy()
+    following = grouped.shift(-1, fill_value=-1).to_numpy()
+
+    # both rows of a game share its GAME_ID; they are paired by it alone, since the home flag
+    # cannot tell them apart for neutral-site games
+    games, game_ids = pd.factorize(df['GAME_ID'])
+    keyed = np.flatnonzero(games >= 0)
+    counts = np.bincount(games[keyed], minlength=len(game_ids))
+    if (counts > 2).any():
+        raise ValueError(f"More than two rows for games {list(game_ids[counts > 2][:5])}")
+    order = keyed[np.argsort(games[keyed], kind='stable')]
+    starts = np.cumsum(counts) - counts
+    first = order[starts]
+    second = np.where(counts == 2, order[np.minimum(starts + 1, len(order) - 1)], -1)
+    partner = np.full(len(df), -1)
+    partner[keyed] = np.where(first[games[keyed]] == keyed, second[games[keyed]], first[games[keyed]])
+
+    has_next = following >= 0
+    opponent = np.full(len(df), -1)
+    opponent[has_next] = partner[following[has_next]]
+    result = np.full(len(df), -1)
+    result[opponent >= 0] = previous[opponent[opponent >= 0]]
+    return result
+
+
+@traced("process.opponents")
+def attach_opponents(df):
+    selected_columns = opponent_columns(df)
+    rows = opponent_rows(df)
+    opponents = df[selected_columns].to_numpy(dtype=np.float64).take(rows, axis=0)
+    opponents[rows < 0] = np.nan
+    opponents = pd.DataFrame(opponents, columns=[f"opp_{c}" for c in selected_columns], index=df.index)
+    df = pd.concat([df, opponents], axis=1)
 
     df["25_context_net_rating_difference"] = df["ewm25_context_netRating"] - df["opp_ewm25_context_netRating"]
     df["10_overall_net_rating_difference"] = df["ewm10_netRating"] - df["opp_ewm10_netRating"]
@@ -196,9 +274,31 @@ def process_data(df, player_df, scraped_df):
     df["month_lineup_difference"] = df['lineup_10_rolling_WNI'] - df['opp_lineup_10_rolling_WNI']
     df["recent_lineup_difference"] = df["lineup_5_rolling_WNI"] - df['opp_lineup_5_rolling_WNI']
     df['rest_difference'] = df['rest_days'] - df['opp_rest_days']
-    
-    df[selected_columns] = df[selected_columns].astype(float)
-    df['next_GAME_ID'] = df.groupby(['TEAM_ABBREVIATION', 'season'])['GAME_ID'].shift(-1)
+
+    cast = [column for column in selected_columns if df[column].dtype != np.float64]
+    df[cast] = df[cast].astype(float)
+    df['next_GAME_ID'] = df.groupby(group_keys)['GAME_ID'].shift(-1)
     df = df.dropna(subset=selected_columns)
     df.reset_index(drop=True, inplace=True)
-    return df.copy()
\ No newline at end of file
+    return df
+
+
+@traced("process.compact")
+def compact_features(df):
+    # XGBoost scores float32 inputs, so downcasting the features leaves predictions unchanged
+    dtypes = {column: np.float32 for column in df.columns[df.dtypes == np.float64]}
+    dtypes.update({column: 'category' for column in categorical_columns})
+    return df.astype(dtypes)
+
+
+@traced("process_data")
+def process_data(df, player_df, scraped_df):
+    df = inject_lineups(df, scraped_df)
+    player_df = add_player_rolling(player_df)
+    df = add_lineup_features(df, player_df)
+    df = add_schedule_features(df)
+
+    df = add_streak_record(df)
+    df = add_per_possession(df)
+    df = add_ewm_features(df)
+    return compact_features(attach_opponents(df))
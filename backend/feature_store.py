@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from metrics import traced
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+# bump when the on-disk layout changes; older snapshots are then treated as missing
+SNAPSHOT_FORMAT = 2
+KEEP_VERSIONS = 3
+
+# Layout of one snapshot version:
+#   <store>/<version>/manifest.json   column names, kinds and dtypes, build date
+#   <store>/<version>/float32.npy     every float32 column as one (columns, rows) block, same for float64
+#   <store>/<version>/<i>.npy         any other column (plus <i>.mask.npy for nullable ints; categoricals
+#                                     store their codes, the categories go in the manifest)
+#   <store>/CURRENT                   name of the version to serve
+# Numeric files are opened with mmap_mode='r', so every worker maps the same pages.
+
+
+@traced("feature_store.write")
+def write_snapshot(df, store_dir, date):
+    os.makedirs(store_dir, exist_ok=True)
+    version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+    tmp_dir = os.path.join(store_dir, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+
+    columns = []
+    float_cols = {}
+    for i, (name, dtype) in enumerate(df.dtypes.items()):
+        column = {'name': name, 'dtype': str(dtype)}
+        values = df[name]
+        if dtype in (np.float32, np.float64):
+            column['kind'] = 'float'
+            float_cols.setdefault(str(dtype), []).append(name)
+        elif isinstance(dtype, pd.CategoricalDtype):
+            column['kind'] = 'category'
+            column['categories'] = dtype.categories.tolist()
+            np.save(os.path.join(tmp_dir, f"{i}.npy"), values.cat.codes.to_numpy())
+        elif pd.api.types.is_extension_array_dtype(dtype) and dtype.kind in 'iufb':
+            column['kind'] = 'masked'
+            np.save(os.path.join(tmp_dir, f"{i}.npy"), values.to_numpy(dtype=dtype.numpy_dtype, na_value=0))
+            np.save(os.path.join(tmp_dir, f"{i}.mask.npy"), values.isna().to_numpy())
+        elif dtype != object and not pd.api.types.is_extension_array_dtype(dtype):
+            column['kind'] = 'array'
+            np.save(os.path.join(tmp_dir, f"{i}.npy"), values.to_numpy())
+        else:
+            column['kind'] = 'object'
+            np.save(os.path.join(tmp_dir, f"{i}.npy"), values.to_numpy(dtype=object), allow_pickle=True)
+        columns.append(column)
+
+    for dtype, block_cols in float_cols.items():
+        block = np.ascontiguousarray(df[block_cols].to_numpy(dtype=dtype).T)
+        np.save(os.path.join(tmp_dir, f"{dtype}.npy"), block)
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'version': version,
+        'date': date,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'rows': len(df),
+        'columns': columns,
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), 'w') as f:
+        json.dump(manifest, f)
+
+    os.rename(tmp_dir, os.path.join(store_dir, version))
+    pointer = os.path.join(store_dir, "CURRENT.tmp")
+    with open(pointer, 'w') as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(store_dir, "CURRENT"))
+
+    versions = sorted(name for name in os.listdir(store_dir) if name[:1].isdigit())
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(store_dir, old), ignore_errors=True)
+    return version
+
+
+def read_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, "CURRENT")) as f:
+            version = f.read().strip()
+        with open(os.path.join(store_dir, version, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@traced("feature_store.load")
+def load_snapshot(store_dir, date=None, required=()):
+    # returns (df, version), or (None, None) when the snapshot is missing, from another format,
+    # built for another day or lacks a required column, so the caller can fall back to a rebuild
+    manifest = read_manifest(store_dir)
+    if manifest is None or manifest.get('format') != SNAPSHOT_FORMAT:
+        return None, None
+    if date is not None and manifest['date'] != date:
+        return None, None
+    names = [column['name'] for column in manifest['columns']]
+    if any(name not in names for name in required):
+        return None, None
+
+    path = os.path.join(store_dir, manifest['version'])
+    float_cols = {}
+    for column in manifest['columns']:
+        if column['kind'] == 'float':
+            float_cols.setdefault(column['dtype'], []).append(column['name'])
+    blocks = []
+    for dtype, block_cols in float_cols.items():
+        block = np.load(os.path.join(path, f"{dtype}.npy"), mmap_mode='r')
+        blocks.append(pd.DataFrame(block.T, columns=block_cols, copy=False))
+    df = pd.concat(blocks, axis=1, copy=False) if blocks else pd.DataFrame(index=pd.RangeIndex(manifest['rows']))
+
+    for i, column in enumerate(manifest['columns']):
+        kind = column['kind']
+        if kind == 'float':
+            continue
+        if kind == 'category':
+            codes = np.load(os.path.join(path, f"{i}.npy"), mmap_mode='r')
+            values = pd.Categorical.from_codes(np.asarray(codes), column['categories'])
+        elif kind == 'masked':
+            data = np.load(os.path.join(path, f"{i}.npy"), mmap_mode='r')
+            mask = np.load(os.path.join(path, f"{i}.mask.npy"), mmap_mode='r')
+            values = pd.array(np.asarray(data), dtype=column['dtype'])
+            values[np.asarray(mask)] = pd.NA
+        elif kind == 'array':
+            values = np.load(os.path.join(path, f"{i}.npy"), mmap_mode='r')
+        else:
+            values = np.load(os.path.join(path, f"{i}.npy"), allow_pickle=True)
+        df.insert(i, column['name'], values)
+    if list(df.columns) != names:
+        # float32 and float64 columns interleaved: restoring the order copies the blocks out of the mmap
+        df = df[names]
+    return df, manifest['version']
+
+
+@contextmanager
+def snapshot_lock(store_dir):
+    # serializes rebuilds between workers booting at the same time
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, ".lock"), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,28 @@
+import numpy as np
+
+
+class GameIndex:
+    """
+    gameId -> home team's feature vector for the upcoming game, built once per feature_df.
+    Vectors are rows of one contiguous float32 matrix in configs.features order; XGBoost casts
+    its input to float32 anyway, so predictions are unchanged. version identifies the feature_df
+    the index was built from.
+    """
+
+    def __init__(self, feature_df, columns, version=None):
+        self.version = version
+        home_rows = feature_df[(feature_df['next_home'] == 1).fillna(False)]
+        # the boolean scan in get_predictions used the first matching row
+        home_rows = home_rows.drop_duplicates(subset='next_GAME_ID', keep='first')
+        self.columns = list(columns)
+        self.matrix = np.ascontiguousarray(home_rows[self.columns].to_numpy(dtype=np.float32))
+        self.positions = {game_id: i for i, game_id in enumerate(home_rows['next_GAME_ID'])}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, game_id):
+        return game_id in self.positions
+
+    def rows(self, game_ids):
+        return self.matrix[[self.positions[game_id] for game_id in game_ids]]
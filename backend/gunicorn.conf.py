@@ -0,0 +1,10 @@
+import os
+
+# read by gunicorn from the working directory: `cd backend && gunicorn app:app`.
+# /api/nba-scores/stream keeps a thread busy per open tab (up to SCORE_STREAM_MAX_AGE), so workers
+# run threads; sync workers would be blocked by a handful of tabs.
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
+timeout = 120
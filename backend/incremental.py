@@ -0,0 +1,198 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from data_process import (group_keys, ewm_spans, inject_lineups, add_player_rolling, add_lineup_features,
+                          add_schedule_features, add_per_possession, ewm_columns, ewm_contexts, ewm_frames,
+                          attach_opponents, compact_features)
+from utils import ewm_multi_span, streakRecord
+from metrics import traced
+
+STATE_VERSION = 4
+# the attributes save() writes and load() restores; anything else is rebuilt
+STATE_FIELDS = ('columns', 'groups', 'last_rows', 'final_rows')
+
+# recent_intensity looks three games back, so the last three committed games are replayed as context
+LOOKBACK = 3
+
+
+def row_hashes(frame):
+    # one uint64 per row over every column; object columns (starters lists) hash by their text
+    objects = frame.columns[frame.dtypes == object]
+    return pd.util.hash_pandas_object(frame.astype({column: str for column in objects}), index=False).to_numpy()
+
+
+class IncrementalFeatureEngine:
+    """
+    Produces the same frame as process_data(), but only recomputes games that are new since the
+    last call. A game is committed once the team's following game has been played: from then on
+    nothing that feeds its features (next game's starters, rest days, opponent) can change. For
+    every (team, season) the engine keeps the EWM and streak/record state after its last committed
+    game, that game's pre-opponent feature row, and the finished feature rows of committed games.
+    A fingerprint of the input rows behind each team's committed games (its box score rows and its
+    players' rows up to the last committed date) catches box scores that arrive late: when it no
+    longer matches, everything is rebuilt.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.columns = None
+        self.groups = {}
+        self.last_rows = None
+        self.final_rows = None
+
+    @classmethod
+    def load(cls, path):
+        engine = cls()
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    state = pickle.load(f)
+                if state.get('version') == STATE_VERSION:
+                    for field in STATE_FIELDS:
+                        setattr(engine, field, state[field])
+            except Exception as e:
+                print(f"Error loading feature state, rebuilding: {e}")
+                engine.reset()
+        return engine
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            state = {field: getattr(self, field) for field in STATE_FIELDS}
+            pickle.dump({'version': STATE_VERSION, **state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _fingerprint(df, ind, df_hashes, player_df, player_hashes):
+        # order-independent sums of the row hashes, the players' rows in any order give the same value
+        last = ind[-1]
+        players = ((player_df['TEAM_ABBREVIATION'] == df['TEAM_ABBREVIATION'].iat[last])
+                   & (player_df['GAME_DATE'] <= df['GAME_DATE'].iat[last])).to_numpy()
+        return int(df_hashes[ind].sum()), int(player_hashes[players].sum())
+
+    def _validate(self, df, indices, df_hashes, player_df, player_hashes):
+        if self.columns is not None and list(self.columns) != list(df.columns):
+            return False
+        for key, group in self.groups.items():
+            ind = indices.get(key)
+            if ind is None or len(ind) < group['rows']:
+                return False
+            if df['GAME_ID'].iat[ind[group['rows'] - 1]] != group['GAME_ID']:
+                return False
+            if self._fingerprint(df, ind[:group['rows']], df_hashes, player_df, player_hashes) != group['fingerprint']:
+                return False
+        return True
+
+    @traced("incremental.update")
+    def update(self, df, player_df, scraped_df):
+        df = inject_lineups(df, scraped_df)
+        indices = df.groupby(group_keys).indices
+        df_hashes = row_hashes(df)
+        player_hashes = row_hashes(player_df)
+        if not self._validate(df, indices, df_hashes, player_df, player_hashes):
+            print("Feature state does not match the loaded games, rebuilding from scratch")
+            self.reset()
+        self.columns = list(df.columns)
+
+        played = df['WL'].notna().to_numpy()
+        tail_positions = []
+        lookback_positions = []
+        commit_to = {}
+        for key, ind in indices.items():
+            rows = self.groups.get(key, {}).get('rows', 0)
+            tail_positions.append(ind[max(rows - LOOKBACK, 0):])
+            lookback_positions.append(ind[max(rows - LOOKBACK, 0):rows])
+            commit_to[key] = max(int(played[ind].sum()) - 1, rows)
+
+        tail = df.iloc[np.sort(np.concatenate(tail_positions))].copy()
+        lookback = set(df.index[np.concatenate(lookback_positions)])
+
+        # rolling windows restart at each player's first game, so only players in the new games are replayed
+        since = tail['GAME_DATE'].min()
+        players = player_df.loc[player_df['GAME_DATE'] >= since, 'PLAYER_NAME'].unique()
+        rolling = add_player_rolling(player_df[player_df['PLAYER_NAME'].isin(players)])
+
+        tail = add_lineup_features(tail, rolling)
+        tail = add_schedule_features(tail)
+        new = tail[~(tail['GAME_DATE'] + '_' + tail['TEAM_ABBREVIATION']).isin(lookback)]
+        new = new.sort_values(by=['TEAM_ABBREVIATION', 'season', 'GAME_DATE'], ascending=[True, True, True])
+        new.reset_index(drop=True, inplace=True)
+
+        groups = new.groupby(group_keys, sort=False).indices
+        cuts = {key: commit_to[key] - self.groups.get(key, {}).get('rows', 0) for key in groups}
+
+        wl = new['WL'].to_numpy()
+        streak = np.empty(len(new), dtype=np.int64)
+        record = np.empty(len(new), dtype=np.float64)
+        streak_states = {}
+        for key, ind in groups.items():
+            head, rest = ind[:cuts[key]], ind[cuts[key]:]
+            s1, r1, streak_states[key] = streakRecord(wl[head], *self.groups.get(key, {}).get('streak', (0, 0, 0)))
+            s2, r2, _ = streakRecord(wl[rest], *streak_states[key])
+            streak[ind] = s1 + s2
+            record[ind] = r1 + r2
+        new['streak'] = streak
+        new['record'] = record
+        new = add_per_possession(new)
+
+        selected_columns = ewm_columns(new)
+        contexts = ewm_contexts(new, selected_columns)
+        ewm = np.empty((len(new), len(ewm_spans)) + contexts.shape[1:])
+
+        committed = []
+        for key, ind in groups.items():
+            cut = cuts[key]
+            head, rest = ind[:cut], ind[cut:]
+            seed = self.groups.get(key, {}).get('ewm', (None, None))
+            ewm[head], weighted, old_wt = ewm_multi_span(contexts[head], ewm_spans, *seed)
+            ewm[rest], _, _ = ewm_multi_span(contexts[rest], ewm_spans, weighted, old_wt)
+
+            if cut > 0:
+                committed.append(head)
+                self.groups[key] = {
+                    'rows': commit_to[key],
+                    'GAME_ID': new['GAME_ID'].iat[head[-1]],
+                    'fingerprint': self._fingerprint(df, indices[key][:commit_to[key]], df_hashes,
+                                                     player_df, player_hashes),
+                    'streak': streak_states[key],
+                    'ewm': (weighted, old_wt),
+                }
+
+        new = pd.concat([new] + ewm_frames(ewm, new, selected_columns), axis=1)
+
+        # the previous committed game of every team supplies the shifted opp_ features of its first new game
+        frame = new
+        if self.last_rows is not None:
+            frame = pd.concat([self.last_rows, new]).astype(new.dtypes.to_dict())
+            frame = frame.sort_values(by=['TEAM_ABBREVIATION', 'season', 'GAME_DATE'], ascending=[True, True, True])
+            frame.reset_index(drop=True, inplace=True)
+        finished = attach_opponents(frame)
+        finished_keys = finished['TEAM_ABBREVIATION'] + '_' + finished['GAME_DATE']
+        if self.last_rows is not None:
+            cached_keys = self.last_rows['TEAM_ABBREVIATION'] + '_' + self.last_rows['GAME_DATE']
+            finished = finished[~finished_keys.isin(cached_keys)]
+            finished_keys = finished_keys[finished.index]
+
+        result = finished
+        if self.final_rows is not None:
+            result = pd.concat([self.final_rows, finished]).astype(finished.dtypes.to_dict())
+            result = result.sort_values(by=['TEAM_ABBREVIATION', 'season', 'GAME_DATE'], ascending=[True, True, True])
+        result = result.reset_index(drop=True)
+
+        if committed:
+            committed = new.iloc[np.concatenate(committed)]
+            committed_keys = committed['TEAM_ABBREVIATION'] + '_' + committed['GAME_DATE']
+            committed_rows = finished[finished_keys.isin(committed_keys)]
+            self.final_rows = committed_rows if self.final_rows is None else pd.concat([self.final_rows, committed_rows])
+
+            last_rows = committed.groupby(group_keys, sort=False).tail(1)
+            if self.last_rows is not None:
+                last_rows = pd.concat([self.last_rows, last_rows]).drop_duplicates(subset=group_keys, keep='last')
+            self.last_rows = last_rows.reset_index(drop=True)
+
+        return compact_features(result)
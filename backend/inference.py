@@ -0,0 +1,62 @@
+import numpy as np
+import requests
+
+
+class RemoteModel:
+    # the Dockerized FastAPI predictor; single rows keep using /predict so results match the old path
+
+    def __init__(self, url, batch_url, columns, session=None):
+        self.url = url
+        self.batch_url = batch_url
+        self.columns = list(columns)
+        self.session = session if session is not None else requests.Session()
+        # cleared by the first 404 from batch_url, so later batches skip the probe
+        self.batch_route = True
+
+    def predict_row(self, row_dict):
+        response = self.session.post(self.url, json={"row": row_dict})
+        response.raise_for_status()
+        proba = response.json()
+        return proba.get("home_win_prob")
+
+    def predict(self, matrix):
+        if len(matrix) == 1:
+            return [self.predict_row(dict(zip(self.columns, matrix[0].tolist())))]
+
+        if self.batch_route:
+            response = self.session.post(self.batch_url, json={"columns": self.columns, "rows": matrix.tolist()})
+            if response.status_code != 404:
+                response.raise_for_status()
+                return response.json().get("home_win_probs")
+            self.batch_route = False
+
+        # the deployed model service has no batch route yet: one /predict call per row
+        probs = []
+        for row in matrix:
+            try:
+                probs.append(self.predict_row(dict(zip(self.columns, row.tolist()))))
+            except Exception as e:
+                print(f"XGB service error: {e}")
+                probs.append(None)
+        return probs
+
+
+class LocalModel:
+    # in-process booster loaded once from a saved JSON/UBJ model
+
+    def __init__(self, path, columns):
+        try:
+            import xgboost
+        except ImportError as e:
+            raise RuntimeError("INFERENCE_BACKEND=local needs the xgboost package") from e
+
+        self.booster = xgboost.Booster()
+        self.booster.load_model(path)
+        self.columns = list(columns)
+        names = self.booster.feature_names
+        if names is not None and list(names) != self.columns:
+            raise ValueError(f"Model at {path} was trained on different features than configs.features")
+
+    def predict(self, matrix):
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        return self.booster.inplace_predict(matrix, validate_features=False).tolist()
@@ -0,0 +1,280 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from response_cache import response_cache
+from utils import custom_headers, WNI, advanced_boxscore_request
+
+# stats.nba.com starts refusing clients that go much faster than one request every 1.2s
+BACKFILL_RATE = float(os.environ.get("BACKFILL_RATE", 1 / 1.2))
+BACKFILL_WORKERS = int(os.environ.get("BACKFILL_WORKERS", 4))
+BACKFILL_RETRIES = int(os.environ.get("BACKFILL_RETRIES", 5))
+UPSERT_CHUNK_SIZE = int(os.environ.get("UPSERT_CHUNK_SIZE", 1000))
+BACKFILL_CHECKPOINT = os.environ.get("BACKFILL_CHECKPOINT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "backfill_pending.json"))
+
+
+# one document per key; two players of the same name can meet in a game, but not on one team
+advanced_keys = ['GAME_ID', 'TEAM_ABBREVIATION']
+player_keys = ['GAME_ID', 'PLAYER_NAME', 'TEAM_ABBREVIATION']
+
+
+class TokenBucket:
+    """
+    Request budget shared by every worker thread: `rate` tokens per second, at most `capacity`
+    saved up. acquire() blocks until a token is free. pause() empties the bucket for a while, so
+    a 429 slows down the whole pool rather than just the thread that got it.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class Checkpoint:
+    # {GAME_ID: GAME_DATE} still to download, rewritten after every change so a killed run resumes
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.pending = json.load(f)
+            except ValueError as e:
+                print(f"Error reading backfill checkpoint, starting over: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.pending, f)
+        os.replace(tmp, self.path)
+
+    def add(self, games):
+        with self.lock:
+            self.pending.update(games)
+            self._save()
+
+    def done(self, game_id):
+        with self.lock:
+            self.pending.pop(game_id, None)
+            self._save()
+
+
+def check_advanced_boxscore(data, game_id):
+    # stats.nba.com answers 200 with an empty box score for games it has not processed yet
+    box = data.get('boxScoreAdvanced') if isinstance(data, dict) else None
+    if not box or not all((box.get(side) or {}).get('players') for side in ('homeTeam', 'awayTeam')):
+        raise ValueError(f"Incomplete box score for {game_id}")
+    return data
+
+
+def fetch_advanced_boxscore(session, game_id, timeout=60):
+    # the request nba_api's BoxScoreAdvancedV3 sends, with HTTP errors raised instead of parsed
+    url, params = advanced_boxscore_request(game_id)
+    response = session.get(url, params=params, headers=custom_headers, timeout=timeout)
+    response.raise_for_status()
+    return check_advanced_boxscore(response.json(), game_id)
+
+
+def cached_advanced_boxscore(game_id, cache=response_cache):
+    # an entry that no longer passes the check is dropped and downloaded again
+    data = cache.get(*advanced_boxscore_request(game_id))
+    if data is None:
+        return None
+    try:
+        return check_advanced_boxscore(data, game_id)
+    except ValueError as e:
+        print(f"Dropping cached box score: {e}")
+        forget_advanced_boxscore(game_id, cache)
+        return None
+
+
+def cache_advanced_boxscore(game_id, data, cache=response_cache):
+    # box scores are only requested for finished games, so one that parsed is cached for good
+    cache.put(*advanced_boxscore_request(game_id), data)
+
+
+def forget_advanced_boxscore(game_id, cache=response_cache):
+    cache.delete(*advanced_boxscore_request(game_id))
+
+
+def retry_after(error):
+    # seconds the server asked to wait (0 when it did not say), None for errors not worth retrying
+    if isinstance(error, requests.HTTPError):
+        if error.response.status_code == 429:
+            try:
+                return float(error.response.headers.get('Retry-After', 0))
+            except ValueError:
+                return 0
+        return 0 if error.response.status_code >= 500 else None
+    # dropped connections, timeouts and the html error pages stats.nba.com sometimes serves
+    if isinstance(error, (requests.RequestException, ValueError)):
+        return 0
+    return None
+
+
+class Backfill:
+    """
+    Downloads pending games on a bounded thread pool. Games that lookup() finds (in the response
+    cache) are returned without a request; every other attempt takes a token from the shared
+    limiter. Failures are retried with jittered exponential backoff, except client errors other than 429. Games
+    stay in the checkpoint until handle() has stored them.
+    """
+
+    def __init__(self, fetch, limiter, workers=BACKFILL_WORKERS, retries=BACKFILL_RETRIES, backoff=1.0,
+                 max_backoff=60, checkpoint=None, lookup=None):
+        self.fetch = fetch
+        self.lookup = lookup
+        self.limiter = limiter
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.checkpoint = checkpoint if checkpoint is not None else Checkpoint(None)
+
+    def _download(self, game_id):
+        if self.lookup is not None:
+            data = self.lookup(game_id)
+            if data is not None:
+                return data
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                return self.fetch(game_id)
+            except Exception as e:
+                wait = retry_after(e)
+                if wait is None or attempt == self.retries:
+                    raise
+                if wait:
+                    self.limiter.pause(wait)
+                time.sleep(min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1))
+
+    def run(self, games, handle):
+        # games: {GAME_ID: GAME_DATE}, merged with whatever a previous run left pending.
+        # handle(game_id, game_date, data) runs on the calling thread; returns the failed GAME_IDs
+        self.checkpoint.add(games)
+        pending = dict(self.checkpoint.pending)
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill") as pool:
+            futures = {pool.submit(self._download, game_id): game_id for game_id in pending}
+            for future in as_completed(futures):
+                game_id = futures[future]
+                try:
+                    handle(game_id, pending[game_id], future.result())
+                except Exception as e:
+                    print(f"Error processing {game_id}: {e}")
+                    failed.append(game_id)
+                    continue
+                self.checkpoint.done(game_id)
+        return failed
+
+
+def boxscore_rows(data, game_id, game_date):
+    # the advanced stats row of both teams and the WNI row of every player of one game
+    team_rows, player_rows = [], []
+    for side, home in (('awayTeam', 0), ('homeTeam', 1)):
+        team = data['boxScoreAdvanced'][side]
+        teamcode = team['teamTricode']
+        team_rows.append({
+            **team['statistics'],
+            "GAME_ID": game_id,
+            "TEAM_ABBREVIATION": teamcode,
+            "starters": [f"{p['firstName']} {p['familyName']}" for p in team['players'][:5]],
+        })
+        for p in team['players']:
+            stats = p["statistics"]
+            player_rows.append({
+                "PLAYER_NAME": f"{p['firstName']} {p['familyName']}",
+                "GAME_ID": game_id,
+                "GAME_DATE": game_date,
+                "TEAM_ABBREVIATION": teamcode,
+                "HOME": home,
+                "WNI": WNI(stats['PIE'], stats['minutes'], stats['usagePercentage'], p['comment']),
+            })
+    return team_rows, player_rows
+
+
+def missing_games(advanced_collection, games):
+    # one row per GAME_ID of the game finder frame that has no stored box score yet; only the
+    # fetched ids are looked up instead of every stored document
+    existing = advanced_collection.distinct('GAME_ID', {'GAME_ID': {'$in': games['GAME_ID'].unique().tolist()}})
+    return games[~games['GAME_ID'].isin(set(existing))].drop_duplicates('GAME_ID')
+
+
+def drop_duplicates(collection, keys, chunk_size=UPSERT_CHUNK_SIZE):
+    # keeps the first stored document of every key; returns how many copies were deleted
+    pipeline = [
+        {'$group': {'_id': {key: f"${key}" for key in keys}, 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
+    ]
+    copies = [_id for group in collection.aggregate(pipeline, allowDiskUse=True) for _id in group['ids'][1:]]
+    for start in range(0, len(copies), chunk_size):
+        collection.delete_many({'_id': {'$in': copies[start:start + chunk_size]}})
+    return len(copies)
+
+
+def ensure_unique_index(collection, keys):
+    try:
+        collection.create_index([(key, 1) for key in keys], unique=True)
+    except OperationFailure as e:
+        if e.code != 11000:
+            raise
+        # rows inserted twice before the index existed
+        print(f"Removed {drop_duplicates(collection, keys)} duplicate documents from {collection.full_name}")
+        collection.create_index([(key, 1) for key in keys], unique=True)
+
+
+def ensure_indexes(player_collection, advanced_collection):
+    # the GAME_ID-first unique indexes also serve GAME_ID prefix and $in queries
+    ensure_unique_index(advanced_collection, advanced_keys)
+    ensure_unique_index(player_collection, player_keys)
+    player_collection.create_index([('GAME_DATE', 1)])
+
+
+def upsert_rows(collection, rows, keys, chunk_size=UPSERT_CHUNK_SIZE):
+    # unordered replace-or-insert by key in chunks, so a retried or concurrent run rewrites the
+    # same documents instead of adding copies
+    for start in range(0, len(rows), chunk_size):
+        operations = [ReplaceOne({key: row[key] for key in keys}, row, upsert=True)
+                      for row in rows[start:start + chunk_size]]
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details['writeErrors']
+            if any(error['code'] != 11000 for error in errors):
+                raise
+            # another run inserted the same key between this one's match and insert, now it matches
+            collection.bulk_write([operations[error['index']] for error in errors], ordered=False)
@@ -0,0 +1,249 @@
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+# METRICS=0 turns every stage and upstream hook into the undecorated function / unpatched session
+METRICS = os.environ.get("METRICS", "1") == "1"
+# per-stage peak memory comes from tracemalloc, which slows the pandas stages down, so it is opt-in
+METRICS_TRACE_MEMORY = os.environ.get("METRICS_TRACE_MEMORY", "0") == "1"
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Metric:
+    # one Prometheus metric family, a value per label combination
+
+    def __init__(self, name, help, kind, labelnames=()):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{self._labels(key)} {value!r}")
+        return lines
+
+
+class Counter(Metric):
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, 'counter', labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, 'gauge', labelnames)
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+
+    def __init__(self, name, help, labelnames=(), buckets=SECONDS_BUCKETS):
+        super().__init__(name, help, 'histogram', labelnames)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts, total, count = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[key] = (counts, total + value, count + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                for bound, bucket in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{self._labels(key, [('le', repr(float(bound)))])} {bucket}")
+                lines.append(f"{self.name}_bucket{self._labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{self._labels(key)} {total!r}")
+                lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+stage_seconds = Histogram("pipeline_stage_seconds", "Wall time of a data loading / feature pipeline stage", ("stage",))
+stage_rows = Gauge("pipeline_stage_rows", "Rows produced by the last run of a pipeline stage", ("stage",))
+stage_peak_bytes = Gauge("pipeline_stage_peak_bytes",
+                         "Peak traced allocations above the stage's starting point (METRICS_TRACE_MEMORY=1)", ("stage",))
+stage_errors = Counter("pipeline_stage_errors_total", "Pipeline stages that raised", ("stage",))
+upstream_seconds = Histogram("upstream_request_seconds", "Latency of outgoing HTTP requests", ("host",))
+upstream_responses = Counter("upstream_responses_total", "Outgoing HTTP responses by status code", ("host", "code"))
+upstream_errors = Counter("upstream_errors_total", "Outgoing HTTP requests that failed without a response", ("host",))
+registry = [stage_seconds, stage_rows, stage_peak_bytes, stage_errors, upstream_seconds, upstream_responses, upstream_errors]
+
+last_stages = {}
+
+
+def row_count(result):
+    # rows of the frame a stage returned, or of the first frame in a returned tuple
+    if isinstance(result, tuple):
+        result = next((item for item in result if isinstance(item, (pd.DataFrame, pd.Series))), None)
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    return None
+
+
+class NoStage:
+    # what stage() hands out while METRICS=0
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+no_stage = NoStage()
+local = threading.local()
+
+
+class Stage:
+    """
+    Times one pipeline step. Stages nest: with METRICS_TRACE_MEMORY=1 an outer stage's peak also
+    covers the peaks of the stages inside it, although tracemalloc's peak is reset for each of them.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+        self.peak = 0
+
+    def __enter__(self):
+        self.parent = getattr(local, 'stage', None)
+        local.stage = self
+        if METRICS_TRACE_MEMORY:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, peak)
+            self.base = current
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        local.stage = self.parent
+        stage_seconds.observe(seconds, stage=self.name)
+        if exc_type is not None:
+            stage_errors.inc(stage=self.name)
+        if self.rows is not None:
+            stage_rows.set(self.rows, stage=self.name)
+        record = {'seconds': seconds, 'rows': self.rows}
+        if METRICS_TRACE_MEMORY:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            stage_peak_bytes.set(self.peak - self.base, stage=self.name)
+            record['peak_mb'] = (self.peak - self.base) / 1e6
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, self.peak)
+        last_stages[self.name] = record
+        return False
+
+
+def stage(name):
+    # with stage("load.mongo.player") as s: ...; s.rows = len(df)
+    return Stage(name) if METRICS else no_stage
+
+
+def traced(name):
+    # decorator version of stage(); returns func itself while METRICS=0
+    def decorate(func):
+        if not METRICS:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Stage(name) as current:
+                result = func(*args, **kwargs)
+                current.rows = row_count(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def instrument_session(session):
+    # times every request sent through a requests.Session, labelled by host
+    if not METRICS:
+        return session
+    send = session.send
+
+    @functools.wraps(send)
+    def timed_send(request, **kwargs):
+        host = urlsplit(request.url).hostname or ""
+        start = time.perf_counter()
+        try:
+            response = send(request, **kwargs)
+        except Exception:
+            upstream_seconds.observe(time.perf_counter() - start, host=host)
+            upstream_errors.inc(host=host)
+            raise
+        upstream_seconds.observe(time.perf_counter() - start, host=host)
+        upstream_responses.inc(host=host, code=response.status_code)
+        return response
+
+    session.send = timed_send
+    return session
+
+
+def stage_report():
+    # one line per stage that has run, in the order they first finished
+    lines = []
+    for name, record in last_stages.items():
+        line = f"{name:<32}{record['seconds']:>8.2f}s"
+        if record['rows'] is not None:
+            line += f"{record['rows']:>9} rows"
+        if 'peak_mb' in record:
+            line += f"{record['peak_mb']:>9.1f} MB peak"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def render(extra=()):
+    # Prometheus text exposition of the registry plus any extra metrics the caller keeps
+    lines = []
+    for metric in list(registry) + list(extra):
+        lines.extend(metric.render())
+    if resource is not None:
+        lines.append("# HELP process_max_rss_bytes Peak resident set size of this process")
+        lines.append("# TYPE process_max_rss_bytes gauge")
+        # ru_maxrss is in kilobytes on Linux
+        lines.append(f"process_max_rss_bytes {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,33 @@
+import os
+import sys
+import warnings
+
+import xgboost
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+sys.path.append(os.path.join(parent_dir, "benchmarks"))
+from configs import features
+from data_process import process_data
+from synthetic import load_synthetic
+
+# Regenerates test_model.json: a deliberately tiny booster trained on one synthetic season, so the
+# local inference backend (INFERENCE_BACKEND=local) can be exercised offline. It has no predictive value.
+
+
+def main():
+    warnings.simplefilter('ignore')
+    feature_df = process_data(*load_synthetic())
+    train = feature_df.dropna(subset=['target'])
+    dtrain = xgboost.DMatrix(train[features].to_numpy(dtype='float32'), label=train['target'].astype(int),
+                             feature_names=features)
+    booster = xgboost.train({'objective': 'binary:logistic', 'max_depth': 2, 'eta': 0.3, 'seed': 0},
+                            dtrain, num_boost_round=4)
+    path = os.path.join(current_dir, "test_model.json")
+    booster.save_model(path)
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import pickle
+
+import pandas as pd
+
+from data_process import process_data, compact_features
+from feature_store import write_snapshot, load_snapshot, snapshot_lock
+from metrics import traced
+from utils import previous_season
+
+PARTITION_DIR = os.environ.get("PARTITION_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "partitions"))
+
+# Layout of one season partition:
+#   <root>/<season>/raw.pkl     load_season() output: the merged box/advanced frame and the player rows
+#   <root>/<season>/features/   feature_store snapshot of process_data() over that season alone
+#
+# Cross-season features: team features (EWMs, streak/record, rest, opponents) are grouped by
+# (team, season), and player rolling windows and lineup sums are computed inside the partition, so
+# they restart with every season as they did when only one season was loaded. A season's features
+# therefore depend on its own games only, and a finished season is built once and then read back.
+# The current season is never cached here, it is rebuilt from fresh data on every load. From August
+# until opening night it has no finished games yet, and load() returns the season before it instead.
+
+
+class SeasonPartitions:
+
+    def __init__(self, loader, current, root=PARTITION_DIR, builder=None):
+        # loader(season) -> (df, player_df) shaped like data_load.load_season(); builder(df, player_df,
+        # scraped_df) builds the current season's features, e.g. IncrementalFeatureEngine.update
+        self.loader = loader
+        self.current = current
+        self.root = root
+        self.builder = builder
+
+    def path(self, season):
+        return os.path.join(self.root, season)
+
+    def raw(self, season):
+        raw_path = os.path.join(self.path(season), "raw.pkl")
+        if season != self.current and os.path.exists(raw_path):
+            with open(raw_path, 'rb') as f:
+                return pickle.load(f)
+        loaded = self.loader(season)
+        if loaded is None:
+            raise RuntimeError(f"Could not load season {season}")
+        if season != self.current:
+            os.makedirs(self.path(season), exist_ok=True)
+            tmp = f"{raw_path}.tmp"
+            with open(tmp, 'wb') as f:
+                pickle.dump(loaded, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, raw_path)
+        return loaded
+
+    def build(self, season, scraped_df=None):
+        df, player_df = self.raw(season)
+        if season == self.current:
+            if len(df) == 0:
+                return None
+            if self.builder is not None:
+                return self.builder(df.copy(), player_df, scraped_df)
+        # process_data sorts and reindexes its inputs in place, the cached frames stay untouched
+        return process_data(df.copy(), player_df, scraped_df)
+
+    def features(self, season, scraped_df=None, required=()):
+        # None for a current season without finished games
+        if season == self.current:
+            return self.build(season, scraped_df)
+        store_dir = os.path.join(self.path(season), "features")
+        feature_df, _ = load_snapshot(store_dir, required=required)
+        if feature_df is None:
+            with snapshot_lock(store_dir):
+                feature_df, _ = load_snapshot(store_dir, required=required)
+                if feature_df is None:
+                    print(f"Building features for season {season}...")
+                    feature_df = self.build(season)
+                    write_snapshot(feature_df, store_dir, season)
+        return feature_df
+
+    @traced("partitions.load")
+    def load(self, seasons, scraped_df=None, required=()):
+        # one feature frame over several seasons, ordered like process_data() output; upcoming
+        # lineups only ever belong to the current season
+        seasons = sorted(seasons)
+        frames = [self.features(season, scraped_df if season == self.current else None, required)
+                  for season in seasons]
+        if self.current in seasons and frames[seasons.index(self.current)] is None:
+            # before opening night: the new season's lineups have no games of that season to attach to
+            fallback = previous_season(self.current)
+            print(f"No finished games in {self.current} yet, loading {fallback}")
+            frames[seasons.index(self.current)] = None if fallback in seasons else self.features(fallback, required=required)
+        df = pd.concat([frame for frame in frames if frame is not None], ignore_index=True)
+        df.sort_values(by=['TEAM_ABBREVIATION', 'season', 'GAME_DATE'], ascending=[True, True, True], inplace=True)
+        df.reset_index(drop=True, inplace=True)
+        # per-season categories differ, compact_features re-derives them over the union
+        return compact_features(df)
@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Bounded LRU of (gameId, feature_version) -> home_win_prob with a TTL. Concurrent misses for
+    the same key wait for the first caller's upstream call instead of making their own.
+    Failed predictions (None) are not cached.
+    """
+
+    def __init__(self, maxsize=512, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+
+    def _get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < now:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, value, now):
+        self.entries[key] = (value, now + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def get_many(self, keys, compute):
+        # compute(list of keys) -> {key: value}; called only for keys nobody else is fetching
+        results = {}
+        owned = []
+        waiting = []
+        now = time.monotonic()
+        with self.lock:
+            for key in dict.fromkeys(keys):
+                entry = self._get(key, now)
+                if entry is not None:
+                    self.hits += 1
+                    results[key] = entry[0]
+                elif key in self.inflight:
+                    self.collapsed += 1
+                    waiting.append((key, self.inflight[key]))
+                else:
+                    self.misses += 1
+                    self.inflight[key] = threading.Event()
+                    owned.append(key)
+
+        if owned:
+            computed = {}
+            try:
+                computed = compute(owned)
+            finally:
+                now = time.monotonic()
+                with self.lock:
+                    for key in owned:
+                        value = computed.get(key)
+                        if value is not None:
+                            self._put(key, value, now)
+                        results[key] = value
+                        self.inflight.pop(key).set()
+
+        for key, event in waiting:
+            event.wait()
+            with self.lock:
+                entry = self._get(key, time.monotonic())
+            results[key] = entry[0] if entry is not None else None
+        return results
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'collapsed': self.collapsed,
+            }
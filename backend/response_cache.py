@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_cache.sqlite"))
+# lifetime of responses that can still change (today's lineups), final box scores never expire
+RESPONSE_CACHE_LIVE_TTL = int(os.environ.get("RESPONSE_CACHE_LIVE_TTL", 600))
+
+
+def request_key(url, params=None):
+    # the same request always maps to the same key, whatever order its parameters came in
+    query = urlencode(sorted((params or {}).items()))
+    return hashlib.sha256(f"{url}?{query}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite store of parsed JSON responses keyed by request_key(). Entries without an expiry are
+    kept for good; only successful downloads are stored, so a failed request is retried next run.
+    The connection is opened on first use and shared by every thread of the process.
+    """
+
+    def __init__(self, path, live_ttl=RESPONSE_CACHE_LIVE_TTL):
+        self.path = path
+        self.live_ttl = live_ttl
+        self.db = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _connect(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses "
+                            "(key TEXT PRIMARY KEY, url TEXT, body BLOB, created REAL, expires REAL)")
+        return self.db
+
+    def get(self, url, params=None):
+        key = request_key(url, params)
+        with self.lock:
+            row = self._connect().execute("SELECT body, expires FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] is not None and row[1] < time.time():
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, url, params, payload, ttl=None):
+        body = zlib.compress(json.dumps(payload, separators=(',', ':')).encode())
+        now = time.time()
+        with self.lock:
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                       (request_key(url, params), url, body, now, now + ttl if ttl is not None else None))
+            db.commit()
+
+    def delete(self, url, params=None):
+        with self.lock:
+            db = self._connect()
+            db.execute("DELETE FROM responses WHERE key = ?", (request_key(url, params),))
+            db.commit()
+
+    def fetch(self, url, params, download, live=False):
+        # download() -> payload, only called on a miss; live responses expire after live_ttl
+        payload = self.get(url, params)
+        if payload is None:
+            payload = download()
+            self.put(url, params, payload, self.live_ttl if live else None)
+        return payload
+
+    def stats(self):
+        with self.lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_PATH)
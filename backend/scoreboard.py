@@ -0,0 +1,192 @@
+import threading
+import time
+
+headers = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/117.0",
+    "Accept": "application/json, text/plain, */*",
+    "Referer": "https://www.nba.com/",
+    "Origin": "https://www.nba.com",
+}
+
+SCOREBOARD_URL = 'https://cdn.nba.com/static/json/liveData/scoreboard/todaysScoreboard_00.json'
+PLAY_BY_PLAY_URL = 'https://cdn.nba.com/static/json/liveData/playbyplay/playbyplay_{game_id}.json'
+
+
+class ScoreboardPoller:
+    """
+    Background thread that keeps one in-memory copy of today's scoreboard and the last play of
+    every live game, so /api/nba-scores never calls cdn.nba.com itself and upstream traffic does
+    not grow with the number of clients. Every fetch is conditional (If-None-Match /
+    If-Modified-Since); a 304 keeps the previous payload without downloading or parsing it.
+    `sequence` only advances when a refresh actually changed something, and wait_for_change()
+    lets streaming clients sleep until then.
+    """
+
+    def __init__(self, session, executor, interval=10, idle_interval=60, timeout=5):
+        self.session = session
+        self.executor = executor
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.timeout = timeout
+        self.validators = {}
+        self.last_plays = {}
+        self.current = None
+        self.sequence = 0
+        self.changed = threading.Condition()
+        self.fetches = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.thread = None
+
+    def start(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Error polling scoreboard: {e}")
+        self.thread = threading.Thread(target=self._run, name="scoreboard-poller", daemon=True)
+        self.thread.start()
+
+    def snapshot(self):
+        return self.current
+
+    def wait_for_change(self, sequence, timeout=None):
+        # blocks until a refresh newer than `sequence` changed the scoreboard, returns the current sequence
+        with self.changed:
+            self.changed.wait_for(lambda: self.sequence != sequence, timeout=timeout)
+            return self.sequence
+
+    def _run(self):
+        while True:
+            live = self.current is not None and any(game['gameStatus'] == 2 for game in self.current['games'])
+            time.sleep(self.interval if live else self.idle_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                self.errors += 1
+                print(f"Error polling scoreboard: {e}")
+
+    def _get(self, key, url):
+        # returns the parsed payload, or None when the upstream copy has not changed
+        request_headers = dict(headers)
+        etag, last_modified = self.validators.get(key, (None, None))
+        if etag:
+            request_headers["If-None-Match"] = etag
+        if last_modified:
+            request_headers["If-Modified-Since"] = last_modified
+        self.fetches += 1
+        response = self.session.get(f"{url}?t={int(time.time())}", headers=request_headers, timeout=self.timeout)
+        if response.status_code == 304:
+            self.not_modified += 1
+            return None
+        response.raise_for_status()
+        self.validators[key] = (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return response.json()
+
+    def _refresh_last_play(self, game_id):
+        try:
+            data = self._get(game_id, PLAY_BY_PLAY_URL.format(game_id=game_id))
+            if data is not None:
+                self.last_plays[game_id] = data['game']['actions'][-1]['description']
+        except Exception as e:
+            self.errors += 1
+            print(f"error: Failed to get play by play data: {e}")
+            self.last_plays.setdefault(game_id, "")
+
+    def refresh(self):
+        data = self._get('scoreboard', SCOREBOARD_URL)
+        if data is not None:
+            scoreboard = data['scoreboard']
+            game_date, games = scoreboard['gameDate'], scoreboard['games']
+        elif self.current is not None:
+            game_date, games = self.current['gameDate'], self.current['games']
+        else:
+            return
+
+        live_ids = [game['gameId'] for game in games if game['gameStatus'] == 2]
+        for future in [self.executor.submit(self._refresh_last_play, game_id) for game_id in live_ids]:
+            future.result()
+        # finished games keep the play they ended on; games from previous days are dropped
+        game_ids = {game['gameId'] for game in games}
+        for game_id in list(self.last_plays):
+            if game_id not in game_ids:
+                del self.last_plays[game_id]
+                self.validators.pop(game_id, None)
+
+        last_plays = {game_id: self.last_plays.get(game_id, "") for game_id in live_ids}
+        previous = self.current
+        self.current = {
+            'gameDate': game_date,
+            'games': games,
+            'lastPlays': last_plays,
+            'updated': time.time(),
+        }
+        if previous is None or previous['games'] != games or previous['lastPlays'] != last_plays:
+            with self.changed:
+                self.sequence += 1
+                self.changed.notify_all()
+
+    def stats(self):
+        return {
+            'fetches': self.fetches,
+            'notModified': self.not_modified,
+            'errors': self.errors,
+            'sequence': self.sequence,
+            'updated': self.current['updated'] if self.current else None,
+        }
+
+
+SCHEDULE_URL = 'https://cdn.nba.com/static/json/staticData/scheduleLeagueV2_1.json'
+
+
+def index_schedule(data):
+    # 'MM/DD/YYYY 00:00:00' game dates -> {'YYYY-MM-DD': games}, parsed once per download
+    by_date = {}
+    for day in data['leagueSchedule']['gameDates']:
+        month, day_of_month, year = day['gameDate'].split()[0].split('/')
+        by_date[f"{year}-{month.zfill(2)}-{day_of_month.zfill(2)}"] = day['games']
+    return by_date
+
+
+class Schedule:
+    """
+    The season schedule indexed by date. Requests look games up in a dict; at most once every
+    `interval` seconds a background thread re-downloads the schedule (postponements, playoff games)
+    while every request keeps reading the previous index.
+    """
+
+    def __init__(self, session, interval=3600, timeout=10):
+        self.session = session
+        self.interval = interval
+        self.timeout = timeout
+        self.by_date = {}
+        self.loaded = 0
+        self.lock = threading.Lock()
+
+    def load(self):
+        response = self.session.get(f"{SCHEDULE_URL}?t={int(time.time())}", headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        self.by_date = index_schedule(response.json())
+        self.loaded = time.monotonic()
+
+    def refresh(self):
+        # starts one background download once the index is older than interval; the request that
+        # notices returns the current index straight away, like every other request meanwhile
+        if time.monotonic() - self.loaded < self.interval or not self.lock.acquire(blocking=False):
+            return None
+        thread = threading.Thread(target=self._reload, name="schedule-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def _reload(self):
+        try:
+            self.load()
+        except Exception as e:
+            # keep serving the previous schedule, retry after another interval
+            self.loaded = time.monotonic()
+            print(f"Error refreshing schedule: {e}")
+        finally:
+            self.lock.release()
+
+    def games(self, date):
+        self.refresh()
+        return self.by_date.get(date, [])
@@ -0,0 +1,25 @@
+import sys
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from data_load import load_season, CURRENT_SEASON
+from partitions import SeasonPartitions
+
+# usage: python build_partitions.py 2019-20 2020-21 ...
+# downloads and caches every finished season given, so training and backtests read them from disk
+
+def main(seasons):
+    partitions = SeasonPartitions(load_season, CURRENT_SEASON)
+    for season in seasons:
+        if season == CURRENT_SEASON:
+            print(f"Skipping {season}, the current season is rebuilt daily")
+            continue
+        feature_df = partitions.features(season)
+        print(f"{season}: {len(feature_df)} feature rows in {partitions.path(season)}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
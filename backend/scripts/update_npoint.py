@@ -17,7 +17,15 @@ load_dotenv()
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
-from utils import WNI, rate_limited_call
+from utils import getEndpointDate, game_id_prefix
+from data_load import load_season, load_lineups, CURRENT_SEASON
+from partitions import SeasonPartitions
+from feature_store import write_snapshot
+from ingest import (Backfill, Checkpoint, TokenBucket, boxscore_rows, fetch_advanced_boxscore,
+                    cached_advanced_boxscore, cache_advanced_boxscore, forget_advanced_boxscore, ensure_indexes,
+                    missing_games, upsert_rows, advanced_keys, player_keys, BACKFILL_RATE, BACKFILL_CHECKPOINT)
+from response_cache import response_cache
+from metrics import instrument_session, stage, stage_report
 
 uri = os.getenv("MONGO_URI") #os.environ['MONGO_URI']
 client = MongoClient(uri, server_api=ServerApi('1'))
@@ -36,21 +44,29 @@ custom_headers = {
     'Accept-Language': 'en-US,en;q=0.9'
 }
 
+# games from this many days before the newest stored game are checked again for missing box scores
+UPDATE_LOOKBACK_DAYS = int(os.getenv("UPDATE_LOOKBACK_DAYS", 7))
+
 def main():
     NBAStatsHTTP().headers = custom_headers
+    playerCollection = client['player']['dataframe']
+    advancedCollection = client['advanced']['dataframe']
     try:
-        playerCollection = client['player']['dataframe']
-        advancedCollection = client['advanced']['dataframe']
-        player_df = pd.DataFrame(list(playerCollection.find({}, {'_id': 0})))
-        advanced_df = pd.DataFrame(list(advancedCollection.find({}, {'_id': 0})))
+        ensure_indexes(playerCollection, advancedCollection)
+        newest = playerCollection.find_one({'GAME_ID': {'$regex': f"^{game_id_prefix(CURRENT_SEASON)}"}},
+                                           {'GAME_DATE': 1, '_id': 0}, sort=[('GAME_DATE', -1)])
     except Exception as e:
         print(f"Error fetching from mongodb: {e}")
         return
-    
+
+    date_from = ''
+    if newest is not None:
+        date_from = (datetime.strptime(newest['GAME_DATE'], '%Y-%m-%d') - timedelta(days=UPDATE_LOOKBACK_DAYS)).strftime('%m/%d/%Y')
     gamefinder = leaguegamefinder.LeagueGameFinder(
         league_id_nullable='00',
-        season_nullable='2025-26',
+        season_nullable=CURRENT_SEASON,
         season_type_nullable='Regular Season',
+        date_from_nullable=date_from,
         headers = custom_headers,
         timeout=60
     )
@@ -58,60 +74,60 @@ def main():
     df = gamefinder.get_data_frames()[0]
     df.dropna(subset=['WL'], inplace=True)
     df = df.sort_values('GAME_DATE')
-    all_team_rows = []
-    all_player_rows = []
-
-    existingids = set(advanced_df['GAME_ID'])
-    for gameid, teamcode, date in zip(df.GAME_ID, df.TEAM_ABBREVIATION, df.GAME_DATE):
-        if gameid not in existingids:
-            try:
-                advanced_boxscore = rate_limited_call(gameid)
-
-                if advanced_boxscore['boxScoreAdvanced']['awayTeam']['teamTricode'] == teamcode:
-                    team = advanced_boxscore['boxScoreAdvanced']['awayTeam']
-                    home = 0
-                else:
-                    team = advanced_boxscore['boxScoreAdvanced']['homeTeam']
-                    home = 1
-                team_stats = team['statistics']
 
-                all_team_rows.append({
-                    **team_stats,
-                    "GAME_ID": gameid,
-                    "TEAM_ABBREVIATION": teamcode,
-                    "starters": [f"{p['firstName']} {p['familyName']}"
-                                for p in team['players'][:5]],
-                })
-
-                for p in team['players']:
-                    stats = p["statistics"]
-                    player_name = f"{p['firstName']} {p['familyName']}"
+    try:
+        # both teams' rows come from one box score, so every missing game is downloaded once
+        missing = missing_games(advancedCollection, df)
+    except Exception as e:
+        print(f"Error fetching from mongodb: {e}")
+        return
+    checkpoint = Checkpoint(BACKFILL_CHECKPOINT)
+    try:
+        # a run killed between storing a game and updating the checkpoint already stored it
+        stored = set(advancedCollection.distinct('GAME_ID', {'GAME_ID': {'$in': list(checkpoint.pending)}}))
+    except Exception as e:
+        print(f"Error fetching from mongodb: {e}")
+        return
+    for game_id in stored:
+        checkpoint.done(game_id)
 
+    session = instrument_session(requests.Session())
+    backfill = Backfill(lambda game_id: fetch_advanced_boxscore(session, game_id), TokenBucket(BACKFILL_RATE),
+                        checkpoint=checkpoint, lookup=cached_advanced_boxscore)
+    added = {'player': 0, 'advanced': 0}
 
-                    all_player_rows.append({
-                        "PLAYER_NAME": player_name,
-                        "GAME_ID": gameid,
-                        "GAME_DATE": date,
-                        "TEAM_ABBREVIATION": teamcode,
-                        "HOME": home,
-                        "WNI": WNI(stats['PIE'], stats['minutes'], stats['usagePercentage'], p['comment']),
-                    })        
+    def store(game_id, game_date, data):
+        try:
+            team_rows, player_rows = boxscore_rows(data, game_id, game_date)
+        except Exception:
+            # a cached box score that cannot be parsed is downloaded again next run
+            forget_advanced_boxscore(game_id)
+            raise
+        cache_advanced_boxscore(game_id, data)
+        upsert_rows(playerCollection, player_rows, player_keys)
+        upsert_rows(advancedCollection, team_rows, advanced_keys)
+        added['player'] += len(player_rows)
+        added['advanced'] += len(team_rows)
 
-            except Exception as e:
-                print(f"Error processing {gameid}: {e}")
+    with stage("ingest.backfill") as timed:
+        failed = backfill.run(dict(zip(missing['GAME_ID'], missing['GAME_DATE'])), store)
+        timed.rows = added['advanced']
+    print(f"Added {added['player']} new player rows.")
+    print(f"Added {added['advanced']} new advanced stats rows.")
+    if failed:
+        print(f"{len(failed)} games failed and stay in {BACKFILL_CHECKPOINT} for the next run")
 
-    new_advanced = pd.DataFrame(all_team_rows)
-    new_player = pd.DataFrame(all_player_rows)
-    
-    if not new_player.empty:
-        player_records = new_player.to_dict('records')
-        playerCollection.insert_many(player_records)
-        print(f"Added {len(player_records)} new player rows.")
+    store_dir = os.getenv("FEATURE_STORE_DIR")
+    if store_dir:
+        write_feature_snapshot(store_dir)
+    print(f"Response cache: {response_cache.stats()}")
+    print(stage_report())
 
-    if not new_advanced.empty:
-        advanced_records = new_advanced.to_dict('records')
-        advancedCollection.insert_many(advanced_records)
-        print(f"Added {len(advanced_records)} new advanced stats rows.")
+def write_feature_snapshot(store_dir):
+    # rebuild feature_df from the freshly updated collections so app.py can mmap it at boot
+    feature_df = SeasonPartitions(load_season, CURRENT_SEASON).load([CURRENT_SEASON], load_lineups())
+    version = write_snapshot(feature_df, store_dir, getEndpointDate())
+    print(f"Wrote feature snapshot {version} ({len(feature_df)} rows) to {store_dir}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+sys.path.append(os.path.join(parent_dir, "benchmarks"))
+
+
+class StubServer:
+    """
+    Local HTTP server for tests. handle(method, path, body) returns (status, headers, payload);
+    dict/list payloads are sent as JSON. Every request is recorded as (method, path).
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def respond(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                stub.requests.append((method, self.path))
+                status, headers, payload = stub.handle(method, self.path, body)
+                content = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                self.respond('GET')
+
+            def do_POST(self):
+                self.respond('POST')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(handle):
+        servers.append(StubServer(handle))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    # in-memory MongoClient; mongomock 4.3 does not accept the sort argument pymongo 4.11+
+    # passes along with every ReplaceOne
+    mongomock = pytest.importorskip("mongomock")
+    add_replace = mongomock.collection.BulkOperationBuilder.add_replace
+    monkeypatch.setattr(mongomock.collection.BulkOperationBuilder, "add_replace",
+                        lambda self, selector, doc, upsert, collation=None, hint=None, sort=None:
+                        add_replace(self, selector, doc, upsert, collation=collation))
+    return mongomock.MongoClient()
@@ -0,0 +1,40 @@
+import pandas as pd
+
+from data_load import read_frame, player_fields, advanced_fields
+from ingest import Backfill, TokenBucket, boxscore_rows, missing_games
+from synthetic import advanced_boxscore_payload
+
+
+def store_games(mongo, game_ids):
+    for game_id in game_ids:
+        team_rows, player_rows = boxscore_rows(advanced_boxscore_payload(game_id, 'BOS', 'NYK'), game_id, '2025-11-01')
+        mongo['player']['dataframe'].insert_many(player_rows)
+        mongo['advanced']['dataframe'].insert_many(team_rows)
+
+
+def test_read_frame_matches_find(mongo):
+    store_games(mongo, ['0022400007', '0022500001', '0022500002'])
+    # a document written before a field existed reads back as None
+    mongo['player']['dataframe'].insert_one({'PLAYER_NAME': 'Old Row', 'GAME_ID': '0022500003'})
+    for name, fields in (('player', player_fields), ('advanced', advanced_fields)):
+        collection = mongo[name]['dataframe']
+        query = {'GAME_ID': {'$regex': '^00225'}}
+        loaded = pd.DataFrame(list(collection.find(query, {'_id': 0}))).reindex(columns=fields)
+        loaded = loaded.astype(object).where(loaded.notna(), None)
+        result = read_frame(collection, query, fields, batch_size=7)
+        pd.testing.assert_frame_equal(loaded, result.astype(object).where(result.notna(), None))
+
+
+def test_update_fetches_missing_games_only(mongo):
+    store_games(mongo, ['0022500001', '0022500002'])
+    # the game finder lists both teams of every game
+    games = pd.DataFrame({'GAME_ID': ['0022500001', '0022500001', '0022500002', '0022500002', '0022500003', '0022500003'],
+                          'GAME_DATE': ['2025-11-01'] * 4 + ['2025-11-02'] * 2})
+    missing = missing_games(mongo['advanced']['dataframe'], games)
+    assert missing['GAME_ID'].tolist() == ['0022500003']
+
+    fetched = []
+    backfill = Backfill(lambda game_id: fetched.append(game_id) or advanced_boxscore_payload(game_id, 'BOS', 'NYK'),
+                        TokenBucket(1000))
+    assert backfill.run(dict(zip(missing['GAME_ID'], missing['GAME_DATE'])), lambda *args: None) == []
+    assert fetched == ['0022500003']
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_lineup_features import explode_path
+from data_process import opponent_rows, rolling_cols, add_lineup_features
+
+
+def games_frame(home_flags):
+    # BOS and NYK meet three times; rows sorted by team and date like process_data's frame
+    rows = []
+    for team in ('BOS', 'NYK'):
+        for game, flags in enumerate(home_flags):
+            rows.append({'TEAM_ABBREVIATION': team, 'season': '2025-26', 'GAME_ID': f"g{game}",
+                         'home': flags[0] if team == 'BOS' else flags[1]})
+    return pd.DataFrame(rows)
+
+
+def test_opponent_rows_pair_by_game():
+    # row 0 (BOS, g0) plays g1 next against NYK, whose previous game is row 3 (NYK, g0)
+    expected = [3, 4, -1, 0, 1, -1]
+    assert opponent_rows(games_frame([(1, 0), (0, 1), (1, 0)])).tolist() == expected
+    # a neutral-site game lists neither team as home
+    assert opponent_rows(games_frame([(1, 0), (0, 0), (1, 0)])).tolist() == expected
+
+
+def test_opponent_rows_reject_extra_rows():
+    df = games_frame([(1, 0), (0, 1)])
+    df = pd.concat([df, df.iloc[[0]]], ignore_index=True)
+    with pytest.raises(ValueError, match="g0"):
+        opponent_rows(df)
+
+
+def test_opponent_rows_without_opponent():
+    # NYK's row of g1 is missing, so BOS has no opponent features going into g1
+    df = games_frame([(1, 0), (0, 1)]).drop(index=3).reset_index(drop=True)
+    assert opponent_rows(df).tolist() == [-1, -1, -1]
+
+
+def test_lineup_features_match_explode_merge():
+    players = pd.DataFrame({
+        'PLAYER_NAME': ['A', 'B', 'C', 'A', 'B', 'A'],
+        'GAME_DATE': ['2025-11-01', '2025-11-01', '2025-11-01', '2025-11-03', '2025-11-03', '2025-11-03'],
+    })
+    rng = np.random.default_rng(16)
+    for col in rolling_cols:
+        players[col] = rng.normal(size=len(players))
+    players.loc[2, rolling_cols[0]] = np.nan
+    # A's 2025-11-03 row is listed twice, so it counts twice like the explode + merge path
+    df = pd.DataFrame({
+        'GAME_ID': ['g1', 'g1', 'g2', 'g2', 'g3'],
+        'TEAM_ABBREVIATION': ['BOS', 'NYK', 'BOS', 'NYK', 'BOS'],
+        'GAME_DATE': ['2025-11-01', '2025-11-01', '2025-11-03', '2025-11-03', '2025-11-05'],
+        'starters': [['A', 'B'], ['C', 'D'], ['A', 'B'], None, ['A']],
+    })
+    pd.testing.assert_frame_equal(add_lineup_features(df.copy(), players), explode_path(df, players), rtol=1e-12)
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import feature_store
+from feature_store import write_snapshot, load_snapshot, read_manifest, KEEP_VERSIONS
+
+
+def features_frame():
+    return pd.DataFrame({
+        'TEAM_ABBREVIATION': pd.Categorical(['BOS', 'NYK', 'BOS', None], categories=['NYK', 'BOS', 'LAL']),
+        'a': np.array([1.5, np.nan, -2., 4.], dtype=np.float32),
+        'b': np.array([0.1, 0.2, 0.3, 0.4]),
+        'c': np.array([3., 2., 1., 0.], dtype=np.float32),
+        'target': pd.array([1, None, 0, 1], dtype='Int64'),
+        'home': np.array([1, 0, 1, 0]),
+        'GAME_DATE': ['2025-11-01', '2025-11-01', '2025-11-03', None],
+        'starters': [['A', 'B'], None, ['C'], ['D', 'E']],
+    })
+
+
+def test_snapshot_round_trip(tmp_path):
+    df = features_frame()
+    version = write_snapshot(df, str(tmp_path), '2025-11-04')
+    loaded, loaded_version = load_snapshot(str(tmp_path), '2025-11-04', required=['a', 'starters'])
+    assert loaded_version == version
+    # float32 and float64 columns come back from their blocks in the original order
+    pd.testing.assert_frame_equal(df, loaded)
+    assert loaded['TEAM_ABBREVIATION'].cat.categories.tolist() == ['NYK', 'BOS', 'LAL']
+    assert loaded['starters'].tolist() == df['starters'].tolist()
+
+    assert load_snapshot(str(tmp_path), '2025-11-05') == (None, None)
+    assert load_snapshot(str(tmp_path), required=['missing']) == (None, None)
+
+
+def test_failed_write_keeps_current(tmp_path, monkeypatch):
+    version = write_snapshot(features_frame(), str(tmp_path), '2025-11-04')
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(feature_store.json, 'dump', fail)
+    with pytest.raises(OSError):
+        write_snapshot(features_frame().iloc[:2], str(tmp_path), '2025-11-05')
+    monkeypatch.undo()
+    # CURRENT only moves once a version is complete
+    assert read_manifest(str(tmp_path))['version'] == version
+    assert len(load_snapshot(str(tmp_path))[0]) == 4
+
+
+def test_keeps_last_versions(tmp_path):
+    versions = [write_snapshot(features_frame(), str(tmp_path), '2025-11-04') for _ in range(KEEP_VERSIONS + 2)]
+    stored = sorted(name for name in os.listdir(tmp_path) if name[:1].isdigit())
+    assert stored == versions[-KEEP_VERSIONS:]
+    with open(tmp_path / "CURRENT") as f:
+        assert f.read() == versions[-1]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
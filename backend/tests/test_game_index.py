@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from game_index import GameIndex
+
+
+@pytest.fixture
+def feature_df():
+    return pd.DataFrame({
+        'next_GAME_ID': ['g1', 'g1', 'g2', 'g3', 'g3', 'g4'],
+        'next_home': [0, 1, 1, 1, 1, np.nan],
+        'a': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        'b': [10.0, 20.0, np.nan, 40.0, 50.0, 60.0],
+        'c': [7, 8, 9, 10, 11, 12],
+    })
+
+
+def test_rows_match_first_home_row(feature_df):
+    index = GameIndex(feature_df, ['b', 'a'], 'v1')
+    assert index.version == 'v1'
+    assert len(index) == 3
+    assert index.positions == {'g1': 0, 'g2': 1, 'g3': 2}
+    assert index.matrix.dtype == np.float32 and index.matrix.flags['C_CONTIGUOUS']
+
+    for game_id in index.positions:
+        home = feature_df[(feature_df['next_GAME_ID'] == game_id) & (feature_df['next_home'] == 1)].iloc[0]
+        expected = home[['b', 'a']].to_numpy(dtype=np.float32)
+        assert np.array_equal(index.rows([game_id])[0], expected, equal_nan=True)
+
+    np.testing.assert_array_equal(index.rows(['g3', 'g1']), [[40, 4], [20, 2]])
+
+
+def test_missing_game_id(feature_df):
+    index = GameIndex(feature_df, ['a', 'b'])
+    # away-only and unknown next_home games are not indexed
+    assert 'g1' in index and 'g4' not in index and 'g9' not in index
+    with pytest.raises(KeyError):
+        index.rows(['g1', 'g9'])
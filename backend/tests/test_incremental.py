@@ -0,0 +1,88 @@
+import pickle
+
+import pandas as pd
+import pytest
+
+from data_load import advanced_fields
+from data_process import process_data
+from incremental import IncrementalFeatureEngine, STATE_VERSION
+from synthetic import make_season, load_synthetic_until
+
+
+@pytest.fixture(scope="module")
+def season():
+    return make_season(seed=3, days=60)
+
+
+def game_dates(season):
+    return sorted(season[0]['GAME_DATE'].unique())
+
+
+def test_update_matches_full_rebuild(season, tmp_path):
+    path = tmp_path / "feature_state.pkl"
+    engine = IncrementalFeatureEngine()
+    for last_date in game_dates(season)[20:50:8]:
+        expected = process_data(*load_synthetic_until(season, last_date))
+        result = engine.update(*load_synthetic_until(season, last_date))
+        pd.testing.assert_frame_equal(expected, result, check_exact=True)
+        # every boot starts from the state the previous one saved
+        engine.save(path)
+        engine = IncrementalFeatureEngine.load(path)
+
+
+def test_update_rebuilds_when_games_change(season):
+    dates = game_dates(season)
+    engine = IncrementalFeatureEngine()
+    engine.update(*load_synthetic_until(season, dates[30]))
+    # an earlier cutoff no longer contains the committed games, the engine has to start over
+    expected = process_data(*load_synthetic_until(season, dates[20]))
+    result = engine.update(*load_synthetic_until(season, dates[20]))
+    pd.testing.assert_frame_equal(expected, result, check_exact=True)
+
+
+def test_load_restores_named_fields_only(season, tmp_path):
+    path = tmp_path / "feature_state.pkl"
+    engine = IncrementalFeatureEngine()
+    engine.update(*load_synthetic_until(season, game_dates(season)[20]))
+    engine.save(path)
+    with open(path, 'rb') as f:
+        state = pickle.load(f)
+    assert set(state) == {'version', 'columns', 'groups', 'last_rows', 'final_rows'}
+
+    state['stale'] = 1
+    with open(path, 'wb') as f:
+        pickle.dump(state, f)
+    loaded = IncrementalFeatureEngine.load(path)
+    assert not hasattr(loaded, 'stale')
+    assert loaded.groups.keys() == engine.groups.keys()
+
+
+def test_load_ignores_other_versions(tmp_path):
+    path = tmp_path / "feature_state.pkl"
+    with open(path, 'wb') as f:
+        pickle.dump({'version': STATE_VERSION - 1, 'groups': {('BOS', '2025-26'): {}}}, f)
+    assert IncrementalFeatureEngine.load(path).groups == {}
+
+
+def test_load_starts_over_on_missing_fields(tmp_path):
+    path = tmp_path / "feature_state.pkl"
+    with open(path, 'wb') as f:
+        pickle.dump({'version': STATE_VERSION, 'groups': {('BOS', '2025-26'): {}}}, f)
+    engine = IncrementalFeatureEngine.load(path)
+    assert engine.groups == {} and engine.columns is None
+
+
+def test_update_rebuilds_games_backfilled_late(season):
+    dates = game_dates(season)
+    df, player_df, scraped_df = load_synthetic_until(season, dates[30])
+    # one game's advanced box score and player rows arrive only after its teams have played again
+    game_id = df.loc[df['GAME_DATE'] == dates[25], 'GAME_ID'].iloc[0]
+    late = df['GAME_ID'] == game_id
+    partial = df.copy()
+    partial.loc[late, [field for field in advanced_fields if field not in ('GAME_ID', 'TEAM_ABBREVIATION')]] = None
+    engine = IncrementalFeatureEngine()
+    engine.update(partial, player_df[player_df['GAME_ID'] != game_id], scraped_df.copy())
+
+    expected = process_data(df.copy(), player_df, scraped_df.copy())
+    result = engine.update(df.copy(), player_df, scraped_df.copy())
+    pd.testing.assert_frame_equal(expected, result, check_exact=True)
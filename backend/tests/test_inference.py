@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+
+xgboost = pytest.importorskip("xgboost")
+
+from configs import features
+from data_process import process_data
+from game_index import GameIndex
+from inference import LocalModel, RemoteModel
+from synthetic import load_synthetic
+
+TEST_MODEL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "test_model.json")
+
+
+@pytest.fixture(scope="module")
+def game_index():
+    return GameIndex(process_data(*load_synthetic(days=40)), features, "test")
+
+
+@pytest.fixture
+def model_service(stub_server):
+    # the model service, predicting with the same booster from the JSON it is sent
+    booster = xgboost.Booster()
+    booster.load_model(TEST_MODEL)
+    batch = {'enabled': True}
+
+    def predict(rows):
+        return booster.inplace_predict(np.asarray(rows, dtype=np.float32), validate_features=False).tolist()
+
+    def handle(method, path, body):
+        if path == '/predict':
+            return 200, {}, {'home_win_prob': predict([[body['row'][name] for name in features]])[0]}
+        if path == '/predict-batch' and batch['enabled']:
+            assert body['columns'] == features
+            return 200, {}, {'home_win_probs': predict(body['rows'])}
+        return 404, {}, {'detail': 'Not Found'}
+
+    server = stub_server(handle)
+    server.batch = batch
+    return server
+
+
+def test_local_model_loads_bundled_model(game_index):
+    probs = LocalModel(TEST_MODEL, features).predict(game_index.matrix)
+    assert len(probs) == len(game_index)
+    assert all(0 < p < 1 for p in probs)
+
+
+def test_local_model_rejects_other_features():
+    with pytest.raises(ValueError):
+        LocalModel(TEST_MODEL, list(reversed(features)))
+
+
+def test_local_matches_remote(game_index, model_service):
+    local = LocalModel(TEST_MODEL, features)
+    remote = RemoteModel(f"{model_service.url}/predict", f"{model_service.url}/predict-batch", features)
+    # requests refuses to send NaN as JSON, so compare on games whose features are all known
+    complete = np.isfinite(game_index.matrix).all(axis=1)
+    rows = game_index.matrix[complete][:12]
+
+    expected = local.predict(rows)
+    assert remote.predict(rows) == expected
+    assert [remote.predict(rows[i:i + 1])[0] for i in range(len(rows))] == expected
+
+    # a service without the batch route gets one /predict call per row
+    model_service.batch['enabled'] = False
+    assert remote.predict(rows) == expected
+
+
+def test_remote_probes_batch_route_once(game_index, model_service):
+    model_service.batch['enabled'] = False
+    remote = RemoteModel(f"{model_service.url}/predict", f"{model_service.url}/predict-batch", features)
+    rows = game_index.matrix[np.isfinite(game_index.matrix).all(axis=1)][:3]
+    for _ in range(3):
+        assert len(remote.predict(rows)) == 3
+    paths = [path for _, path in model_service.requests]
+    assert paths.count('/predict-batch') == 1
+    assert paths.count('/predict') == 9
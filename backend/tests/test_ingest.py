@@ -0,0 +1,126 @@
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+import utils
+from ingest import (Backfill, Checkpoint, TokenBucket, boxscore_rows, ensure_indexes, fetch_advanced_boxscore,
+                    cached_advanced_boxscore, cache_advanced_boxscore, upsert_rows, advanced_keys, player_keys)
+from response_cache import ResponseCache
+from synthetic import advanced_boxscore_payload
+
+
+def game_rows(game_id):
+    return boxscore_rows(advanced_boxscore_payload(game_id, 'BOS', 'NYK'), game_id, '2025-11-01')
+
+
+def test_ensure_indexes_drops_duplicates_first(mongo):
+    players, advanced = mongo['player']['dataframe'], mongo['advanced']['dataframe']
+    team_rows, player_rows = game_rows('0022500001')
+    # an older run stored the same game twice before the unique indexes existed
+    for _ in range(2):
+        players.insert_many([dict(row) for row in player_rows])
+        advanced.insert_many([dict(row) for row in team_rows])
+
+    ensure_indexes(players, advanced)
+    assert players.count_documents({}) == len(player_rows)
+    assert advanced.count_documents({}) == len(team_rows)
+    assert any(index['key'] == [(key, 1) for key in player_keys] and index.get('unique')
+               for index in players.index_information().values())
+    # a second run finds the indexes in place
+    ensure_indexes(players, advanced)
+
+
+def test_upsert_twice_is_idempotent(mongo):
+    players, advanced = mongo['player']['dataframe'], mongo['advanced']['dataframe']
+    ensure_indexes(players, advanced)
+    team_rows, player_rows = game_rows('0022500001')
+    for _ in range(2):
+        upsert_rows(players, [dict(row) for row in player_rows], player_keys, chunk_size=3)
+        upsert_rows(advanced, [dict(row) for row in team_rows], advanced_keys)
+
+    stored = list(players.find({}, {'_id': 0}).sort([('TEAM_ABBREVIATION', 1), ('PLAYER_NAME', 1)]))
+    expected = sorted(player_rows, key=lambda row: (row['TEAM_ABBREVIATION'], row['PLAYER_NAME']))
+    assert [row['PLAYER_NAME'] for row in stored] == [row['PLAYER_NAME'] for row in expected]
+    assert advanced.count_documents({}) == 2
+
+    # a corrected box score replaces the stored rows instead of adding copies
+    team_rows[0]['pace'] = 0.
+    upsert_rows(advanced, team_rows, advanced_keys)
+    assert advanced.count_documents({}) == 2
+    assert advanced.find_one({'TEAM_ABBREVIATION': team_rows[0]['TEAM_ABBREVIATION']})['pace'] == 0.
+
+
+def box_score_server(stub_server, monkeypatch, responses):
+    # responses: {GAME_ID: [status, ...]} answered in turn, the last one repeats; 200 sends the box score
+    def handle(method, path, body):
+        game_id = parse_qs(urlsplit(path).query)['GameID'][0]
+        statuses = responses[game_id]
+        status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        if status == 200:
+            return 200, {}, advanced_boxscore_payload(game_id, 'BOS', 'NYK')
+        return status, {'Retry-After': '0.05'} if status == 429 else {}, {}
+
+    server = stub_server(handle)
+    monkeypatch.setattr(utils, 'STATS_URL', server.url)
+    return server
+
+
+def backfill(checkpoint=None, retries=3):
+    session = requests.Session()
+    return Backfill(lambda game_id: fetch_advanced_boxscore(session, game_id, timeout=5),
+                    TokenBucket(1000), workers=2, retries=retries, backoff=0.01, checkpoint=checkpoint)
+
+
+def requested(server):
+    return [parse_qs(urlsplit(path).query)['GameID'][0] for _, path in server.requests]
+
+
+def test_backfill_retries_throttled_and_failed_requests(stub_server, monkeypatch):
+    server = box_score_server(stub_server, monkeypatch, {'0022500001': [429, 503, 200], '0022500002': [404]})
+    stored = {}
+    failed = backfill().run({'0022500001': '2025-11-01', '0022500002': '2025-11-01'},
+                            lambda game_id, game_date, data: stored.update({game_id: boxscore_rows(data, game_id, game_date)}))
+    assert list(stored) == ['0022500001']
+    # a 404 is not retried
+    assert failed == ['0022500002']
+    assert sorted(requested(server)) == ['0022500001'] * 3 + ['0022500002']
+
+
+def test_backfill_resumes_from_checkpoint(stub_server, monkeypatch, tmp_path):
+    path = str(tmp_path / "backfill_pending.json")
+    server = box_score_server(stub_server, monkeypatch, {'0022500001': [500], '0022500002': [200]})
+    failed = backfill(Checkpoint(path), retries=1).run({'0022500001': '2025-11-01', '0022500002': '2025-11-02'},
+                                                       lambda *args: None)
+    assert failed == ['0022500001']
+    with open(path) as f:
+        assert json.load(f) == {'0022500001': '2025-11-01'}
+
+    # the next run picks up the failed game without being told about it again
+    server.requests.clear()
+    server.handle = lambda method, path, body: (200, {}, advanced_boxscore_payload('0022500001', 'BOS', 'NYK'))
+    stored = []
+    assert backfill(Checkpoint(path)).run({}, lambda game_id, game_date, data: stored.append((game_id, game_date))) == []
+    assert stored == [('0022500001', '2025-11-01')]
+    assert requested(server) == ['0022500001']
+    assert Checkpoint(path).pending == {}
+
+
+def test_empty_box_score_is_not_cached(stub_server, monkeypatch, tmp_path):
+    # stats.nba.com answers 200 with a null box score until it has processed the game
+    server = stub_server(lambda method, path, body: (200, {}, {'boxScoreAdvanced': None}))
+    monkeypatch.setattr(utils, 'STATS_URL', server.url)
+    cache = ResponseCache(str(tmp_path / "response_cache.sqlite"))
+    failed = backfill(retries=1).run({'0022500001': '2025-11-01'},
+                                     lambda game_id, game_date, data: cache_advanced_boxscore(game_id, data, cache))
+    assert failed == ['0022500001']
+    assert len(server.requests) == 2
+    assert cache.stats()['entries'] == 0
+
+    # an entry cached before the check existed is dropped on lookup
+    cache_advanced_boxscore('0022500001', {'boxScoreAdvanced': None}, cache)
+    assert cached_advanced_boxscore('0022500001', cache) is None
+    assert cache.stats()['entries'] == 0
+    with pytest.raises(ValueError, match="0022500001"):
+        fetch_advanced_boxscore(requests.Session(), '0022500001')
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from data_process import process_data, compact_features
+from incremental import IncrementalFeatureEngine
+from partitions import SeasonPartitions
+from synthetic import load_synthetic
+
+
+@pytest.fixture(scope="module")
+def seasons():
+    # one short synthetic season per label, as load_season() would return them
+    loaded = {}
+    for year in (2024, 2025):
+        df, player_df, scraped_df = load_synthetic(seed=year, start_year=year, days=40)
+        loaded[f"{year}-{str(year + 1)[-2:]}"] = (df, player_df, scraped_df)
+    return loaded
+
+
+def test_current_season_goes_through_builder(seasons, tmp_path):
+    df, player_df, scraped_df = seasons['2025-26']
+    engine = IncrementalFeatureEngine()
+    partitions = SeasonPartitions(lambda season: seasons[season][:2], '2025-26', root=tmp_path, builder=engine.update)
+    result = partitions.load(['2025-26'], scraped_df)
+    expected = compact_features(process_data(df.copy(), player_df, scraped_df))
+    pd.testing.assert_frame_equal(expected, result, check_exact=True)
+    assert engine.groups
+
+
+def test_current_season_without_games_falls_back(seasons, tmp_path):
+    def loader(season):
+        if season == '2026-27':
+            # before opening night the new season has no finished games
+            df, player_df, _ = seasons['2025-26']
+            return df.iloc[:0], player_df.iloc[:0]
+        return seasons[season][:2]
+
+    partitions = SeasonPartitions(loader, '2026-27', root=tmp_path)
+    result = partitions.load(['2026-27'], seasons['2025-26'][2])
+    df, player_df, _ = seasons['2025-26']
+    expected = compact_features(process_data(df.copy(), player_df, None))
+    pd.testing.assert_frame_equal(expected, result, check_exact=True)
+    # the finished season is cached like any other partition
+    assert (tmp_path / '2025-26' / 'raw.pkl').exists()
+    both = partitions.load(['2025-26', '2026-27'])
+    pd.testing.assert_frame_equal(expected, both, check_exact=True)
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import prediction_cache
+from prediction_cache import PredictionCache
+
+
+class Loader:
+    # compute() for get_many that records every call; gate holds the first call until it is set
+
+    def __init__(self, gate=None):
+        self.calls = []
+        self.gate = gate
+        self.started = threading.Event()
+
+    def __call__(self, keys):
+        self.calls.append(list(keys))
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        return {key: 0.5 for key in keys}
+
+
+def test_concurrent_misses_run_loader_once():
+    cache = PredictionCache()
+    loader = Loader(gate=threading.Event())
+    results = []
+    first = threading.Thread(target=lambda: results.append(cache.get_many([('g1', 'v1')], loader)))
+    first.start()
+    loader.started.wait(5)
+    others = [threading.Thread(target=lambda: results.append(cache.get_many([('g1', 'v1')], loader)))
+              for _ in range(4)]
+    for thread in others:
+        thread.start()
+    # the waiting threads have registered once every one of them counted as collapsed
+    deadline = time.monotonic() + 5
+    while cache.stats()['collapsed'] < 4 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    loader.gate.set()
+    for thread in [first] + others:
+        thread.join(5)
+
+    assert loader.calls == [[('g1', 'v1')]]
+    assert results == [{('g1', 'v1'): 0.5}] * 5
+    assert cache.stats()['misses'] == 1 and cache.stats()['collapsed'] == 4
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.]
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', lambda: now[0])
+    cache = PredictionCache(ttl=60)
+    loader = Loader()
+    cache.get_many(['g1'], loader)
+    now[0] += 59
+    cache.get_many(['g1'], loader)
+    assert len(loader.calls) == 1
+    now[0] += 2
+    cache.get_many(['g1'], loader)
+    assert len(loader.calls) == 2
+
+
+def test_least_recently_used_is_evicted():
+    cache = PredictionCache(maxsize=2)
+    loader = Loader()
+    cache.get_many(['g1', 'g2'], loader)
+    # g1 is used again, so g2 is the oldest when g3 arrives
+    cache.get_many(['g1'], loader)
+    cache.get_many(['g3'], loader)
+    assert list(cache.entries) == ['g1', 'g3']
+    cache.get_many(['g2'], loader)
+    assert loader.calls[-1] == ['g2']
+
+
+def test_new_feature_version_misses():
+    cache = PredictionCache()
+    loader = Loader()
+    cache.get_many([('g1', 'v1')], loader)
+    # keys carry the snapshot version, a reloaded snapshot asks the model again
+    cache.get_many([('g1', 'v2')], loader)
+    assert loader.calls == [[('g1', 'v1')], [('g1', 'v2')]]
+    cache.clear()
+    cache.get_many([('g1', 'v2')], loader)
+    assert len(loader.calls) == 3
+    assert cache.stats()['size'] == 1
+
+
+def test_failed_predictions_are_not_cached():
+    cache = PredictionCache()
+    calls = []
+    cache.get_many(['g1'], lambda keys: calls.append(keys) or {})
+    cache.get_many(['g1'], lambda keys: calls.append(keys) or {})
+    assert len(calls) == 2
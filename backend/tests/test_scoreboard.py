@@ -0,0 +1,70 @@
+import threading
+
+from scoreboard import Schedule
+
+
+def schedule_json(date, game_id):
+    return {'leagueSchedule': {'gameDates': [{'gameDate': f'{date} 00:00:00', 'games': [{'gameId': game_id}]}]}}
+
+
+class Response:
+
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class Session:
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls += 1
+        self.gate.wait(5)
+        return Response(self.data)
+
+
+def test_refresh_serves_stale_index_while_one_thread_downloads():
+    session = Session(schedule_json('11/01/2025', 'old'))
+    schedule = Schedule(session, interval=0)
+    schedule.load()
+    assert session.calls == 1
+
+    session.data = schedule_json('11/01/2025', 'new')
+    session.gate.clear()
+    refresh = schedule.refresh()
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(schedule.games('2025-11-01'))) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join(5)
+    # every request is answered from the old index while the one download is still blocked
+    assert results == [[{'gameId': 'old'}]] * 8
+    assert session.calls == 2
+
+    schedule.interval = 3600
+    session.gate.set()
+    refresh.join(5)
+    assert schedule.games('2025-11-01') == [{'gameId': 'new'}]
+    assert session.calls == 2
+
+
+def test_failed_refresh_keeps_previous_index():
+    session = Session(schedule_json('11/01/2025', 'old'))
+    schedule = Schedule(session, interval=0)
+    schedule.load()
+    session.data = None
+    schedule.refresh().join(5)
+    schedule.interval = 3600
+    assert schedule.games('2025-11-01') == [{'gameId': 'old'}]
+    assert not schedule.lock.locked()
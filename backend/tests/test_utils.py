@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+
+import metrics
+import utils
+from legacy import add_rolling
+from utils import add_rolling_means
+
+
+def test_rolling_means_match_add_rolling():
+    rng = np.random.default_rng(17)
+    df = pd.DataFrame({
+        'PLAYER_NAME': rng.choice(['A', 'B', 'C', None], size=400),
+        'HOME': rng.integers(0, 2, size=400),
+        'WNI': rng.normal(scale=50, size=400),
+    })
+    df.loc[rng.choice(400, size=60, replace=False), 'WNI'] = np.nan
+    # long runs of large values before small ones are where running sums lose the most digits
+    df.loc[:100, 'WNI'] *= 1e4
+    df = df.sort_values(['PLAYER_NAME'], kind='stable', na_position='first')
+
+    expected = add_rolling(df.copy(), ['PLAYER_NAME', 'HOME'], 'WNI', [1, 5, 25], 'context_')
+    expected = add_rolling(expected, ['PLAYER_NAME'], 'WNI', [1, 5, 25], '')
+    result = add_rolling_means(df.copy(), {'context_': ['PLAYER_NAME', 'HOME'], '': ['PLAYER_NAME']}, 'WNI', [1, 5, 25])
+    pd.testing.assert_frame_equal(expected, result, rtol=1e-9, atol=1e-6)
+    assert result.loc[df['PLAYER_NAME'].isna(), '5_rolling_WNI'].isna().all()
+
+
+class ScoreboardAdapter(BaseAdapter):
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps({'scoreboard': {'gameDate': '2025-11-01', 'games': []}}).encode()
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def test_endpoint_date_is_counted_upstream(monkeypatch):
+    monkeypatch.setattr(utils.upstream_session, 'get_adapter', lambda url: ScoreboardAdapter())
+    key = ('cdn.nba.com', '200')
+    before = metrics.upstream_responses.values.get(key, 0)
+    assert utils.getEndpointDate() == '2025-11-01'
+    assert metrics.upstream_responses.values[key] == before + 1
@@ -1,3 +1,4 @@
+import os
 import time
 from datetime import datetime, timedelta
 import unicodedata
@@ -6,12 +7,11 @@ import requests_cache
 from requests.models import Request
 import pandas as pd
 import numpy as np
-from nba_api.stats.endpoints import boxscoreadvancedv3
-from nba_api.stats.library.http import NBAStatsHTTP
+from response_cache import response_cache
+from metrics import instrument_session
 
 
-last_call = 0
-MIN_INTERVAL = 1.2
+STATS_URL = os.environ.get("NBA_STATS_URL", "https://stats.nba.com/stats")
 custom_headers = {
     'Host': 'stats.nba.com',
     'Connection': 'keep-alive',
@@ -25,17 +25,14 @@ custom_headers = {
     'Accept-Encoding': 'gzip, deflate, br',
     'Accept-Language': 'en-US,en;q=0.9'
 }
-def rate_limited_call(game_id):
-    NBAStatsHTTP().headers = custom_headers
-    global last_call
-    elapsed = time.time() - last_call
-    if elapsed < MIN_INTERVAL:
-        time.sleep(MIN_INTERVAL - elapsed)
+# lineups and the scoreboard date are fetched through this session, so they show up in the
+# upstream metrics like the requests app.py sends
+upstream_session = instrument_session(requests.Session())
 
-    result = boxscoreadvancedv3.BoxScoreAdvancedV3(game_id=game_id, headers=custom_headers, timeout=60).get_dict()
-
-    last_call = time.time()
-    return result
+def advanced_boxscore_request(game_id):
+    # the url and parameters nba_api's BoxScoreAdvancedV3 sends, also the box score's response cache key
+    params = {'EndPeriod': 0, 'EndRange': 0, 'GameID': game_id, 'RangeType': 0, 'StartPeriod': 0, 'StartRange': 0}
+    return f"{STATS_URL}/boxscoreadvancedv3", params
 
 def removeSuffix(s):
   split = s.strip().split(" ")
@@ -62,80 +59,131 @@ def WNI(pie, mins, usg, comment): # calculates a players impact in a given game
       return np.nan
   return mins * usg * pie
 
-def add_rolling(df, group_cols, value_col, windows, prefix):
-    for w in windows:
-        df[f"{prefix}{w}_rolling_{value_col}"] = (
-            df.groupby(group_cols)[value_col]
-              .rolling(window=w, min_periods=1)
-              .mean()
-              .reset_index(level=list(range(len(group_cols))), drop=True)
-        )
+def add_rolling_means(df, groupings, value_col, windows):
+    # rolling(window, min_periods=1).mean() of value_col per group, for several groupings in one
+    # call: groupings maps a column prefix to its group columns. Values are laid out as (game number, group) and each window's sum and count are
+    # differences of per-group running sums, so the columns match rolling(window, min_periods=1)
+    # .mean() up to float rounding. Rows keep their current order within each group.
+    values = df[value_col].to_numpy(dtype=np.float64)
+    windows = np.asarray(windows)[:, None]
+    for prefix, group_cols in groupings.items():
+        grouped = df.groupby(group_cols, sort=False, dropna=True)
+        groups = grouped.ngroup().to_numpy(dtype=np.float64, na_value=-1).astype(np.int64)
+        keyed = groups >= 0
+        games = grouped.cumcount().to_numpy(dtype=np.float64, na_value=-1).astype(np.int64)
+        out = np.full((len(windows), len(df)), np.nan)
+        if keyed.any():
+            grid = np.full((games[keyed].max() + 1, groups.max() + 1), np.nan)
+            grid[games[keyed], groups[keyed]] = values[keyed]
+            means = rolling_means(grid, windows)
+            out[:, keyed] = means[:, games[keyed], groups[keyed]]
+        for w, column in zip(windows[:, 0], out):
+            df[f"{prefix}{w}_rolling_{value_col}"] = column
     return df
 
-def find_weighted_team_averages(team, span, context, cols):
-  team = team.copy()
-  if context==1:
-    homeMasked = team[cols].where(team['home'] == 1)
-    awayMasked = team[cols].where(team['home'] == 0)
-
-    ewmaHome = homeMasked.ewm(span=span, adjust=False).mean()
-    ewmaAway = awayMasked.ewm(span=span, adjust=False).mean()
-
-    out = ewmaHome.where(team['next_home'] == 1, ewmaAway)
-    out = out.mask(team['next_home'].isna())
-  else:
-    out = team[cols].ewm(span=span, adjust=False).mean()
-  return out
-
-def computeStreak(group):
-    streak = 0
+def rolling_means(grid, windows):
+    # grid is (game number, group) with NaN for missing values; windows is (windows, 1).
+    # Returns (windows, game number, group) means over the last w games, NaN where none observed.
+    observed = grid == grid
+    sums = np.vstack([np.zeros((1, grid.shape[1])), np.cumsum(np.where(observed, grid, 0.), axis=0)])
+    counts = np.vstack([np.zeros((1, grid.shape[1]), dtype=np.int64), np.cumsum(observed, axis=0)])
+    end = np.arange(1, grid.shape[0] + 1)
+    start = np.maximum(end[None, :] - windows, 0)
+    window_sums = sums[end][None] - sums[start]
+    window_counts = counts[end][None] - counts[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+def ewm_multi_span(values, spans, weighted=None, old_wt=None):
+    # DataFrame.ewm(span, adjust=False).mean() for several spans in one pass over the rows of a
+    # (rows, ...) array, resumable: (weighted, old_wt) after the last row can seed the next call.
+    # out is (rows, len(spans), ...) and the state has the shape of one output row.
+    values = np.asarray(values, dtype=np.float64)
+    spans = np.asarray(spans, dtype=np.float64).reshape((-1,) + (1,) * (values.ndim - 1))
+    alpha = 1. / (1. + (spans - 1) / 2.0)
+    factor = 1. - alpha
+    shape = spans.shape[:1] + values.shape[1:]
+    weighted = np.full(shape, np.nan) if weighted is None else weighted.copy()
+    old_wt = np.ones(shape) if old_wt is None else old_wt.copy()
+    out = np.empty(values.shape[:1] + shape)
+    for i in range(values.shape[0]):
+        cur = values[i]
+        observed = cur == cur
+        started = weighted == weighted
+        old_wt = np.where(started, old_wt * factor, old_wt)
+        blended = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        weighted = np.where(started & observed & (weighted != cur), blended, weighted)
+        weighted = np.where(~started & observed, cur, weighted)
+        old_wt = np.where(started & observed, 1., old_wt)
+        out[i] = weighted
+    return out, weighted, old_wt
+
+def streakRecord(results, streak=0, wins=0, losts=0):
+    # win/loss streak and win share after every game in one pass, resumable from the returned counters
     streak_list = []
-    for result in group['WL']:
+    record_list = []
+    for result in results:
         if result == 1:
             streak = streak + 1 if streak >= 0 else 1
+            wins += 1
         else:
             streak = streak - 1 if streak <= 0 else -1
+            losts += 1
         streak_list.append(streak)
-    # Return a Series with the same index
-    return pd.Series(streak_list, index=group.index)
-
-def computeRecord(group):
-    wins = 0
-    losts = 0
-    record_list = []
-    for result in group['WL']:
-      if result == 1:
-        wins+=1
-      else:
-        losts+=1
-      record_list.append(wins/(wins+losts))
-    return pd.Series(record_list, index = group.index)
+        record_list.append(wins/(wins+losts))
+    return streak_list, record_list, (streak, wins, losts)
+
+def computeStreakRecord(df, group_cols, value_col='WL'):
+    # streakRecord for every group at once, following row order within each group
+    codes = df.groupby(group_cols, sort=False).ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+    win = (df[value_col] == 1).fillna(False).to_numpy(dtype=bool)[order]
+    position = np.arange(len(order))
+
+    # with groups contiguous, every counter is the distance to the row that opened the group or the run
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+    group_start = np.maximum.accumulate(np.where(first, position, 0))
+    run_start = first.copy()
+    run_start[1:] |= win[1:] != win[:-1]
+    run_start = np.maximum.accumulate(np.where(run_start, position, 0))
+
+    games = position - group_start + 1
+    wins = np.cumsum(win)
+    wins = wins - wins[group_start] + win[group_start]
+    length = position - run_start + 1
+
+    streak = np.empty(len(order), dtype=np.int64)
+    record = np.empty(len(order), dtype=np.float64)
+    streak[order] = np.where(win, length, -length)
+    record[order] = wins / games
+    return pd.Series(streak, index=df.index), pd.Series(record, index=df.index)
 
 def get_lineups():
     try:
-      date = (datetime.now()).strftime('%Y%m%d')
-      cache_buster = int(time.time())
-      url = f'https://stats.nba.com/js/data/leaders/00_daily_lineups_{date}.json?={cache_buster}'
       headers = {
           "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/117.0",
           "Accept": "application/json, text/plain, */*",
           "Referer": "https://www.nba.com/",
           "Origin": "https://www.nba.com",
       }
-      response = requests.get(url, headers=headers)
 
-      if response.status_code != 200:
+      def fetch(date):
+        # lineups change until tip-off, so they are only cached for a few minutes
+        url = f'https://stats.nba.com/js/data/leaders/00_daily_lineups_{date}.json'
+        def download():
+          response = upstream_session.get(f"{url}?={int(time.time())}", headers=headers)
+          response.raise_for_status()
+          return response.json()
+        return response_cache.fetch(url, None, download, live=True)
+
+      date = (datetime.now()).strftime('%Y%m%d')
+      try:
+        data = fetch(date)
+      except requests.HTTPError:
         date = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
-        cache_buster = int(time.time())
-        url = f'https://stats.nba.com/js/data/leaders/00_daily_lineups_{date}.json?={cache_buster}'
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/117.0",
-            "Accept": "application/json, text/plain, */*",
-            "Referer": "https://www.nba.com/",
-            "Origin": "https://www.nba.com",
-        }
-        response = requests.get(url, headers=headers)
-      data = response.json()
+        data = fetch(date)
       date_formatted = date[:4] + "-" + date[4:6] + "-" + date[6:]
       game_data = data['games']
       games = []
@@ -167,6 +215,26 @@ def getEndpointDate():
       "Referer": "https://www.nba.com/",
       "Origin": "https://www.nba.com",
   }
-  response = requests.get(url, headers=headers)
+  response = upstream_session.get(url, headers=headers)
   data = response.json()
-  return data['scoreboard']['gameDate']
\ No newline at end of file
+  return data['scoreboard']['gameDate']
+
+def season_label(start_year):
+  return f"{start_year}-{str(start_year + 1)[-2:]}"
+
+def season_of_date(date):
+  # seasons start in October; the offseason counts towards the coming season
+  return season_label(date.year if date.month >= 8 else date.year - 1)
+
+def previous_season(season):
+  return season_label(int(season[:4]) - 1)
+
+def season_of_game_ids(game_ids):
+  # GAME_IDs look like 0022500001: game type, then the last two digits of the season's first year
+  years = pd.Series(game_ids).str[3:5].astype(int)
+  years = years + np.where(years >= 46, 1900, 2000)
+  return years.astype(str) + '-' + (years + 1).astype(str).str[-2:]
+
+def game_id_prefix(season):
+  # regular season GAME_IDs of a season, as in season_of_game_ids()
+  return f"002{season[2:4]}"
@@ -251,15 +251,50 @@ const App: React.FC = () => {
 
     fetchLiveScores(date, controller.signal);
 
-    const today = new Date().toLocaleDateString();
-    if (today === date.toLocaleDateString()) {
+    let source: EventSource | undefined = undefined;
+    const startPolling = () => {
       intervalId = setInterval(() => {
         fetchLiveScores(date, controller.signal);
       }, 15000);
+    };
+
+    const today = new Date().toLocaleDateString();
+    if (today === date.toLocaleDateString()) {
+      if (typeof EventSource !== 'undefined') {
+        // the server pushes only the games of this date that changed, keyed by gameId
+        source = new EventSource(`/api/nba-scores/stream?date=${encodeURIComponent(formatDate(date))}`);
+        source.onmessage = (event) => {
+          const changed: Record<string, Game> = JSON.parse(event.data);
+          setLiveGames((prev) => {
+            const known = new Set(prev.map(g => g.id));
+            const updated = prev.map((g) => {
+              const newGame = changed[g.id];
+              if (!newGame) return g;
+              return {
+                ...newGame,
+                homeTeam: { ...newGame.homeTeam, winProb: g.homeTeam.winProb },
+                visitorTeam: { ...newGame.visitorTeam, winProb: g.visitorTeam.winProb },
+              };
+            });
+            return updated.concat(Object.values(changed).filter(g => !known.has(g.id)));
+          });
+        };
+        // a stream that ends is reopened by the browser; one the server refused (e.g. 503 when
+        // it is at its stream limit, or a host without streaming) stays closed, so poll instead
+        source.onerror = () => {
+          if (source && source.readyState === EventSource.CLOSED && !intervalId) {
+            source.close();
+            startPolling();
+          }
+        };
+      } else {
+        startPolling();
+      }
     }
 
     return () => {
       controller.abort();
+      if (source) source.close();
       if (intervalId) clearInterval(intervalId);
     };
   }, [date]);